@@ -0,0 +1,171 @@
+import threading
+import time
+import numpy as np
+from Dataset import PULSE_DTYPE, parse_int_lines
+
+
+class PulseRingBuffer:
+    """
+    Preallocated single-producer / single-consumer ring buffer of pulses.
+
+    The producer never blocks: when the consumer falls more than `capacity` pulses behind,
+    the oldest unread pulses are overwritten and reported as dropped on the next read.
+    No lock is needed because each side only advances its own counter.
+    """
+
+    def __init__(self, capacity=2**20, dtype=PULSE_DTYPE):
+        self.capacity = capacity
+        self.records = np.zeros(capacity, dtype=dtype)
+        self.written = 0  # Total pulses ever written (only advanced by the producer)
+        self.writing = 0  # written plus the pulses being stored right now; slots below writing - capacity may be overwritten
+        self.read = 0     # Total pulses consumed or dropped (only advanced by the consumer)
+        self.dropped = 0
+
+    def append(self, count, unix_time, peak, time_stamp, time_since_last):
+        """Store one pulse (producer side)."""
+        self.writing = self.written + 1
+        self.records[self.written % self.capacity] = (count, unix_time, peak, time_stamp, time_since_last)
+        self.written += 1
+
+    def extend(self, records):
+        """Store a structured array of pulses (producer side)."""
+        n = len(records)
+        if n == 0:
+            return
+        if n > self.capacity:
+            # Only the newest pulses fit; the rest count as written and are dropped by the consumer
+            self.written += n - self.capacity
+            records = records[-self.capacity:]
+            n = self.capacity
+
+        # Announced before the slots are touched, so a reader copying them can tell they changed
+        self.writing = self.written + n
+        start = self.written % self.capacity
+        first = min(n, self.capacity - start)
+        self.records[start:start + first] = records[:first]
+        self.records[:n - first] = records[first:]
+        self.written += n
+
+    def read_new(self):
+        """Returns a copy of every pulse written since the previous call (consumer side)."""
+        written = self.written
+        start = max(self.read, written - self.capacity)
+        indices = np.arange(start, written) % self.capacity
+        snapshot = self.records[indices]
+
+        # Slots the producer overwrote (or started to overwrite) while they were being copied are discarded
+        overwritten = min(self.writing - self.capacity - start, len(snapshot))
+        if overwritten > 0:
+            snapshot = snapshot[overwritten:]
+            start += overwritten
+
+        self.dropped += start - self.read
+        self.read = written
+        return snapshot
+
+
+class SerialReader(threading.Thread):
+    """
+    Background thread that continuously reads `peak time_stamp time_since_last_pulse` lines
+    from the serial port, stores them in a PulseRingBuffer (unless pulse_buffer is None) and writes them to the data file
+    (and to a binary dataset when a BinaryDatasetWriter is given, and to the sidecar time index
+    of the data file when a DatasetIndexWriter is given). Every batch of pulses is also
+    handed to the `listeners` (objects with a non-blocking submit(records) method).
+    Whatever bytes are waiting are read and parsed at once, so the cost per pulse stays low at high rates.
+    """
+
+    max_partial_line = 4096  # Bytes kept waiting for a newline before they are discarded as garbage
+
+    def __init__(self, serial_port, pulse_buffer, file=None, binary_writer=None, listeners=None, flush_interval=1.0, index_writer=None):
+        super(SerialReader, self).__init__(daemon=True)
+        self.serial_port = serial_port
+        self.pulse_buffer = pulse_buffer
+        self.file = file
+        self.binary_writer = binary_writer
+        self.listeners = listeners if listeners is not None else []
+        self.index_writer = index_writer
+        self.flush_interval = flush_interval  # Seconds between flushes of the data file
+        self.count = 0
+        self.malformed = 0
+        self.bytes_written = 0  # Size of the text written to the data file
+        self._partial_line = b""
+        self._stop_event = threading.Event()
+
+    def run(self):
+        last_flush = time.time()
+        while not self._stop_event.is_set():
+            try:
+                # Everything already waiting in one call; blocks for the first byte until the serial timeout
+                data = self.serial_port.read(max(1, self.serial_port.in_waiting))
+            except Exception as e:
+                print(f"Error in SerialReader: {e}")
+                break
+
+            if data:
+                self.handleChunk(data)
+
+            if time.time() - last_flush >= self.flush_interval:
+                self.flush()
+                last_flush = time.time()
+
+        self.flush()
+
+    def flush(self):
+        """Ensure data is written to disk."""
+        if self.file is not None:
+            self.file.flush()
+        if self.binary_writer is not None:
+            self.binary_writer.flush()
+        if self.index_writer is not None:
+            self.index_writer.flush()
+
+    def handleChunk(self, data):
+        """Parse every complete line in a chunk of bytes and store the pulses, keeping any partial trailing line."""
+        data = self._partial_line + data
+        end = data.rfind(b"\n") + 1
+        self._partial_line = data[end:]
+        if len(self._partial_line) > self.max_partial_line:
+            self._partial_line = b""
+            self.malformed += 1
+        if end == 0:
+            return
+
+        table, malformed = parse_int_lines(data[:end], 3)
+        self.malformed += malformed
+        if len(table) == 0:
+            return
+
+        records = np.empty(len(table), dtype=PULSE_DTYPE)
+        records['count'] = np.arange(self.count + 1, self.count + 1 + len(table))
+        records['unix_time'] = int(time.time())  # Unix timestamp in seconds
+        records['peak'] = table[:, 0]
+        records['time_stamp'] = table[:, 1]
+        records['time_since_last'] = table[:, 2]
+        self.count += len(table)
+
+        if self.pulse_buffer is not None:
+            self.pulse_buffer.extend(records)
+        self.writeDataToFile(records)
+        for listener in self.listeners:
+            listener.submit(records)
+
+    def writeDataToFile(self, records):
+        """Write acquired data to file with a single write per batch."""
+        if self.binary_writer is not None:
+            self.binary_writer.write(records)
+        if self.file is None:
+            return
+
+        # Format: count; unix_time_seconds (s); peak (mV); time_stamp(ms); time_since_last_pulse (ms)
+        columns = [records[name] for name in PULSE_DTYPE.names]
+        flat = np.column_stack(columns).ravel().tolist()
+        text = "%d %d %d %d %d\n" * len(records) % tuple(flat)
+        if self.index_writer is not None:
+            self.index_writer.add(records, text)
+        self.file.write(text)
+        self.bytes_written += len(text)
+
+    def stop(self):
+        """Ask the thread to finish and wait for the last flush."""
+        self._stop_event.set()
+        self.join()
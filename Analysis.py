@@ -1,126 +1,249 @@
-import matplotlib.pyplot as plt
 import numpy as np
+from ConvertToBinary import StreamingExtractor, parity_binary
+from Dataset import PULSE_DTYPE, iter_dataset, load_dataset
+from StreamingHistogram import ExponentialAccumulator
 
 
 def extract_values(file_path):
-    with open(file_path, 'r') as file:
-        lines = file.readlines()
+    # Pulses closer than 14 ms to the previous one fall inside the dead time and are discarded
+    return load_dataset(file_path, columns=PULSE_DTYPE.names, min_time_since_last=14)
+
+
+def as_chunks(values):
+    """Arrays and lists are analyzed as a single chunk; any other iterable is taken as a stream of chunks."""
+    if isinstance(values, (list, tuple, np.ndarray)):
+        return [np.asarray(values)]
+    return values
+
+
+class ParityCounter:
+    """Method 1: one bit per interval, 1 if the interval is odd."""
+    column = 'time_since_last'
+
+    def __init__(self):
+        self.total_numbers = 0
+        self.odd_count = 0
+
+    def update(self, time_since_last):
+        self.total_numbers += len(time_since_last)
+        self.odd_count += int(np.count_nonzero(parity_binary(time_since_last)))
+
+    def summary(self):
+        total_numbers = self.total_numbers
+        even_count = total_numbers - self.odd_count
+
+        odd_percentage = (self.odd_count / total_numbers) * 100
+        even_percentage = (even_count / total_numbers) * 100
+        return {'lost': (total_numbers-total_numbers) / total_numbers * 100, 'ones': odd_percentage, 'zeros': even_percentage}
+
+    def report(self):
+        summary = self.summary()
+        print("Method 1 (Parity): ")
+        print(f"Percentage of lost bits: {summary['lost']:.2f}%")
+        print(f"Percentage of 1's: {summary['ones']:.4f}%")
+        print(f"Percentage of 0's: {summary['zeros']:.4f}%")
+
+
+class CountsParityCounter:
+    """Method 3: one bit per fixed time interval, from the parity of the number of time stamps in it."""
+    column = 'time_stamp'
+
+    def __init__(self, interval_ms):
+        self.interval_ms = interval_ms
+        self.num_time_stamps = 0
+        self.max_time = None
+        self.counts_per_interval = np.zeros(0, dtype=np.int64)  # Indexed by time_stamp // interval_ms
+
+    def update(self, time_stamps):
+        if len(time_stamps) == 0:
+            return
+        self.num_time_stamps += len(time_stamps)
+        chunk_max = int(np.max(time_stamps))
+        self.max_time = chunk_max if self.max_time is None else max(self.max_time, chunk_max)
+
+        indices = np.asarray(time_stamps, dtype=np.int64) // self.interval_ms
+        counts = np.bincount(indices)
+        if len(counts) > len(self.counts_per_interval):
+            counts[:len(self.counts_per_interval)] += self.counts_per_interval
+            self.counts_per_interval = counts
+        else:
+            self.counts_per_interval[:len(counts)] += counts
+
+    def intervals(self):
+        """Counts per interval with the same bins as np.histogram over np.arange(0, max_time + interval_ms, interval_ms)."""
+        num_intervals = -(-self.max_time // self.interval_ms)  # Ceiling division
+        counts_per_interval = self.counts_per_interval[:num_intervals].copy()
+        if self.max_time % self.interval_ms == 0 and num_intervals > 0:
+            # The last bin edge is inclusive, so time stamps equal to max_time belong to the last interval
+            counts_per_interval[-1] += self.counts_per_interval[num_intervals]
+        return counts_per_interval
+
+    def summary(self):
+        counts_per_interval = self.intervals()
+
+        # Determine parity of counts in each interval
+        even_count = int(np.count_nonzero(counts_per_interval % 2 == 0))
+        odd_count = len(counts_per_interval) - even_count
+
+        total_intervals = len(counts_per_interval)
+        even_percentage = (even_count / total_intervals) * 100
+        odd_percentage = (odd_count / total_intervals) * 100
+        return {'lost': 100-total_intervals/self.num_time_stamps * 100, 'even': even_percentage, 'odd': odd_percentage}
+
+    def report(self):
+        summary = self.summary()
+        print(f"\nMethod 3 (Counts Parity in {self.interval_ms} ms intervals):")
+        print(f"Percentage of lost bits: {summary['lost']:.2f}%")
+        print(f"Percentage of intervals with even counts: {summary['even']:.4f}%")
+        print(f"Percentage of intervals with odd counts: {summary['odd']:.4f}%")
+
+
+class PairParityCounter:
+    """Method 1 corrected: consecutive pairs (odd, even) give a 1 and (even, odd) give a 0; other pairs are discarded."""
+    column = 'time_since_last'
+
+    def __init__(self):
+        self.total_numbers = 0
+        self.ones_count = 0
+        self.zeros_count = 0
+        self.extractor = StreamingExtractor('pair_parity')  # Keeps the first value of a pair split across chunks
+
+    def update(self, time_since_last):
+        self.total_numbers += len(time_since_last)
+
+        # (odd, even) pairs give 1 and (even, odd) pairs give 0, the others are discarded
+        bits = self.extractor.extract(time_since_last)
+        ones = int(np.count_nonzero(bits))
+        self.ones_count += ones
+        self.zeros_count += len(bits) - ones
+
+    def summary(self):
+        total_bits = self.ones_count + self.zeros_count
+
+        ones_percentage = (self.ones_count / total_bits) * 100
+        zeros_percentage = (self.zeros_count / total_bits) * 100
+        lost_percentage = ((self.total_numbers - total_bits) / self.total_numbers) * 100
+        return {'lost': lost_percentage, 'ones': ones_percentage, 'zeros': zeros_percentage}
+
+    def report(self):
+        summary = self.summary()
+        print("\nMethod 1 Corrected: ")
+        print(f"Percentage of lost bits: {summary['lost']:.2f}%")
+        print(f"Percentage of 1's: {summary['ones']:.4f}%")
+        print(f"Percentage of 0's: {summary['zeros']:.4f}%")
+
+
+class IntervalsCounter:
+    """Method 2: compares the intervals i and i + 1 for every i multiple of Steps; equal intervals are discarded."""
+    column = 'time_since_last'
+
+    def __init__(self, Steps=1):
+        self.Steps = Steps
+        self.total_numbers = 0
+        self.ones_count = 0
+        self.zeros_count = 0
+        self.extractor = StreamingExtractor('intervals', Steps)  # Keeps the last interval of the previous chunk
+
+    def update(self, time_since_last):
+        self.total_numbers += len(time_since_last)
+
+        # intervals_binary gives 1 when delta_t1 > delta_t2, which this method counts as a 0
+        bits = self.extractor.extract(time_since_last)
+        zeros = int(np.count_nonzero(bits))
+        self.zeros_count += zeros
+        self.ones_count += len(bits) - zeros
+
+    def summary(self):
+        total_bits = self.zeros_count + self.ones_count
+
+        ones_percentage = (self.ones_count / total_bits) * 100
+        zeros_percentage = (self.zeros_count / total_bits) * 100
+        return {'lost': (self.total_numbers - total_bits) / self.total_numbers * 100, 'ones': ones_percentage, 'zeros': zeros_percentage}
+
+    def report(self):
+        summary = self.summary()
+        print(f"\nMethod 2 (Step of {self.Steps}): ")
+        print(f"Percentage of lost bits: {summary['lost']:.2f}%")
+        print(f"Percentage of 1's: {summary['ones']:.4f}%")
+        print(f"Percentage of 0's: {summary['zeros']:.4f}%")
+
+
+class MinCounter:
+    """Counts how often each of the 20 smallest interval values appears, to find the Geiger dead time."""
+    column = 'time_since_last'
+
+    def __init__(self):
+        self.histogram = ExponentialAccumulator()
 
-    counts = []
-    unix_time_stamps = []
-    peak_values = []
-    time_stamps = []
-    time_since_last = []
+    def update(self, time_since_last):
+        self.histogram.add(time_since_last)
 
-    for line in lines:
-        parts = line.strip().split()
-        if int(parts[4]) >= 14:
-            counts.append(int(parts[0]))
-            unix_time_stamps.append(int(parts[1]))
-            peak_values.append(int(parts[2]))
-            time_stamps.append(int(parts[3]))
-            time_since_last.append(int(parts[4]))
+    def report(self):
+        fine_counts = self.histogram.fine_counts
+        minimum = int(np.flatnonzero(fine_counts)[0])
+        i = 0
+        while i < 20:
+            min_value = minimum + i
+            count_min_value = int(fine_counts[min_value]) if min_value < len(fine_counts) else 0
 
-    return counts, unix_time_stamps, peak_values, time_stamps, time_since_last
+            print(f"\nThe Geiger dead time is {min_value} and it appears {count_min_value} times in the list.")
+            i += 1
 
 
-def analyze_parity(time_since_last):
-    time_since_last = np.array(time_since_last)
-    total_numbers = len(time_since_last)
-    odd_count = sum(1 for number in time_since_last if number % 2 != 0)
-    even_count = total_numbers - odd_count
+def run_counter(counter, values):
+    for chunk in as_chunks(values):
+        counter.update(chunk)
+    counter.report()
 
-    odd_percentage = (odd_count / total_numbers) * 100
-    even_percentage = (even_count / total_numbers) * 100
 
-    print("Method 1 (Parity): ")
-    print(f"Percentage of lost bits: {(total_numbers-total_numbers) / total_numbers * 100:.2f}%")
-    print(f"Percentage of 1's: {odd_percentage:.4f}%")
-    print(f"Percentage of 0's: {even_percentage:.4f}%")
+def analyze_parity(time_since_last):
+    run_counter(ParityCounter(), time_since_last)
 
 
 def analyze_counts_parity(time_stamps, interval_ms):
-    # Determine the maximum time
-    max_time = np.max(time_stamps)
-
-    # Define the bin edges for the intervals
-    bin_edges = np.arange(0, max_time + interval_ms, interval_ms)
-
-    # Count the number of time stamps in each interval
-    counts_per_interval, _ = np.histogram(time_stamps, bins=bin_edges)
-
-    # Determine parity of counts in each interval
-    even_count = sum(1 for count in counts_per_interval if count % 2 == 0)
-    odd_count = len(counts_per_interval) - even_count
-
-    total_intervals = len(counts_per_interval)
-    even_percentage = (even_count / total_intervals) * 100
-    odd_percentage = (odd_count / total_intervals) * 100
-
-    print(f"\nMethod 3 (Counts Parity in {interval_ms} ms intervals):")
-    print(f"Percentage of lost bits: {100-total_intervals/len(time_stamps) * 100:.2f}%")
-    print(f"Percentage of intervals with even counts: {even_percentage:.4f}%")
-    print(f"Percentage of intervals with odd counts: {odd_percentage:.4f}%")
-
+    run_counter(CountsParityCounter(interval_ms), time_stamps)
 
 
 def analyze_pair_parity(time_since_last):
-    last_column_values = time_since_last
-
-    ones_count = 0
-    zeros_count = 0
-
-    # Iterate over the values in steps of 2
-    for i in range(0, len(last_column_values) - 1, 2):
-        value1 = last_column_values[i]
-        value2 = last_column_values[i + 1]
-
-        if value1 % 2 != 0 and value2 % 2 == 0:
-            ones_count += 1
-        elif value1 % 2 == 0 and value2 % 2 != 0:
-            zeros_count += 1
-        # If both are even or both are odd, discard the pair
-
-    total_bits = ones_count + zeros_count
-
-    ones_percentage = (ones_count / total_bits) * 100
-    zeros_percentage = (zeros_count / total_bits) * 100
-    lost_percentage = ((len(last_column_values) - total_bits) / (len(last_column_values))) * 100
-
-    print("\nMethod 1 Corrected: ")
-    print(f"Percentage of lost bits: {lost_percentage:.2f}%")
-    print(f"Percentage of 1's: {ones_percentage:.4f}%")
-    print(f"Percentage of 0's: {zeros_percentage:.4f}%")
+    run_counter(PairParityCounter(), time_since_last)
 
 
 def analyze_intervals(time_since_last, Steps = 1):
-    intervals = time_since_last
+    run_counter(IntervalsCounter(Steps), time_since_last)
 
-    ones_count = 0
-    zeros_count = 0
-    # Iterate over the intervals in steps of 2
-    for i in range(0, len(intervals) - 1, Steps):
-        delta_t1 = intervals[i]
-        delta_t2 = intervals[i + 1]
 
-        if delta_t1 > delta_t2:
-            zeros_count += 1
-        elif delta_t1 < delta_t2:
-            ones_count += 1
-        # If delta_t1 == delta_t2, we discard the event
+def count_file(file_path, counter_class, *args, chunk_bytes=64 * 2**20):
+    """
+    Runs one analysis method over a dataset, one chunk at a time, and returns the counter; with a ResultCache
+    the counting is only done again when the file changes. Example:
+        ResultCache().call(count_file, file_path, IntervalsCounter, 2).report()
+    """
+    counter = counter_class(*args)
+    for chunk in iter_dataset(file_path, counter.column, min_time_since_last=14, chunk_bytes=chunk_bytes):
+        counter.update(chunk)
+    return counter
 
-    total_bits = zeros_count + ones_count
 
-    ones_percentage = (ones_count / total_bits) * 100
-    zeros_percentage = (zeros_count / total_bits) * 100
+def analyze_file_streaming(file_path, counters, chunk_bytes=64 * 2**20):
+    """
+    Runs several analysis methods in a single pass over a dataset, one chunk of about chunk_bytes at a time,
+    so memory use does not depend on the file size. Gives the same results as extract_values followed by the
+    analyze_* functions. Example:
+        analyze_file_streaming(file_path, [IntervalsCounter(), IntervalsCounter(2), CountsParityCounter(12000)])
+    """
+    columns = ['time_stamp', 'time_since_last']
+    for time_stamps, time_since_last in iter_dataset(file_path, columns, min_time_since_last=14, chunk_bytes=chunk_bytes):
+        chunk = {'time_stamp': time_stamps, 'time_since_last': time_since_last}
+        for counter in counters:
+            counter.update(chunk[counter.column])
 
-    print(f"\nMethod 2 (Step of {Steps}): ")
-    print(f"Percentage of lost bits: {(len(intervals) - total_bits) / len(intervals) * 100:.2f}%")
-    print(f"Percentage of 1's: {ones_percentage:.4f}%")
-    print(f"Percentage of 0's: {zeros_percentage:.4f}%")
+    for counter in counters:
+        counter.report()
 
 
 def plot_histogram(peak_values, bins=20):
+    import matplotlib.pyplot as plt  # Imported on first plot, so the analysis functions work without matplotlib
+
     plt.figure(num='Histogram of Peak Values')
     plt.hist(peak_values, bins=bins, range=(700, 800), edgecolor='black')
     plt.title('Histogram of Peak Values')
@@ -130,6 +253,8 @@ def plot_histogram(peak_values, bins=20):
 
 
 def plot_histogram_and_average(time_stamps, counts, interval_minutes, max_interval=None, zoom=False, num_bins=10):
+    import matplotlib.pyplot as plt
+
     # Create the figure and axes based on the zoom parameter
     if zoom:
         fig, (ax2, ax1) = plt.subplots(1, 2, figsize=(18, 6), gridspec_kw={'width_ratios': [1, 5]}, num="Histogram of Time Stamps with Zoom")
@@ -186,6 +311,33 @@ def plot_histogram_and_average(time_stamps, counts, interval_minutes, max_interv
     plt.show(block=False)
 
 
+def plot_store_counts(store, interval_minutes, start_ms=None, end_ms=None):
+    """
+    Counts per interval from a CountStore (see CountStore.py), with the average and uncertainty lines.
+    interval_minutes may be a fraction down to 1 s; the whole history is used unless start_ms/end_ms (unix ms) are given.
+    """
+    import matplotlib.pyplot as plt
+
+    start_ms = store.origin_ms if start_ms is None else start_ms
+    end_ms = store.last_ms + 1 if end_ms is None else end_ms
+    times, hist = store.query(start_ms, end_ms, int(round(interval_minutes * 60)) * 1000)
+
+    # Average and uncertainty as in plot_histogram_and_average, excluding the last (incomplete) bar
+    average_hist_height = np.mean(hist[:-1])
+    uncertainty = np.sqrt(average_hist_height)
+
+    fig, ax = plt.subplots(1, 1, figsize=(12, 6), num="Counts per Time Interval")
+    minutes = (times - times[0]) / 60000.0
+    ax.bar(minutes, hist, width=interval_minutes, align='edge', edgecolor='black', alpha=0.7, label='Number of Time Stamps', color='tab:blue')
+    plot_uncertainty_lines(ax, average_hist_height, uncertainty)
+    ax.set_xlabel('Time (minutes)')
+    ax.set_ylabel('Number of Time Stamps')
+    ax.set_title('Average Counts per Time Interval')
+    ax.legend()
+    plt.tight_layout()
+    plt.show(block=False)
+
+
 def plot_uncertainty_lines(ax, average_height, uncertainty):
     """
     Plots the average height and uncertainty lines on the given axis.
@@ -230,42 +382,72 @@ def plot_projection(ax, unique_heights, counts, average_height, uncertainty, num
 
 
 def find_min_and_count(time_since_last):
-    i = 0
-    while i < 20:
-        min_value = min(time_since_last) + i
-        count_min_value = time_since_last.count(min_value)
-
-        print(f"\nThe Geiger dead time is {min_value} and it appears {count_min_value} times in the list.")
-        i += 1
+    run_counter(MinCounter(), time_since_last)
 
 ### RUN ###
 
-file_path1 = 'Data/GeigerDataset_2024-05-11 09:18:27.155241.txt'
-file_path = 'Data/GeigerDataset_2024-05-24 09:31:24.691587.txt'
-
-# Extract values from the file
-counts, unix_time_stamps, peak_values, time_stamps, time_since_last = extract_values(file_path)
-_, _, _, _, time_since_last2 = extract_values(file_path1)
-
-# Analyze using the different methods
-# analyze_parity(time_since_last)
-# analyze_pair_parity(time_since_last)
-analyze_intervals(time_since_last)
-analyze_intervals(time_since_last2)
-# analyze_intervals(time_since_last, 2)
-# analyze_counts_parity(time_stamps, 12000)
+if __name__ == '__main__':
+    import argparse
+    import matplotlib.pyplot as plt
+
+    parser = argparse.ArgumentParser(description="Analyze GeigerDataset files with the bit extraction methods.")
+    parser.add_argument('file_path', nargs='?', default='Data/GeigerDataset_2024-05-24 09:31:24.691587.txt')
+    parser.add_argument('file_path1', nargs='?', default='Data/GeigerDataset_2024-05-11 09:18:27.155241.txt')
+    args = parser.parse_args()
+
+    file_path1 = args.file_path1
+    file_path = args.file_path
+
+    # Extract values from the file
+    counts, unix_time_stamps, peak_values, time_stamps, time_since_last = extract_values(file_path)
+    _, _, _, _, time_since_last2 = extract_values(file_path1)
+
+    # Analyze using the different methods
+    # analyze_parity(time_since_last)
+    # analyze_pair_parity(time_since_last)
+    analyze_intervals(time_since_last)
+    analyze_intervals(time_since_last2)
+    # analyze_intervals(time_since_last, 2)
+    # analyze_counts_parity(time_stamps, 12000)
+
+    # Time stamps corrected for millis() rollovers, Arduino resets and clock drift (see ClockSync.py)
+    # from ClockSync import reconcile_file
+    # reconciled_ms = reconcile_file(file_path)[0]  # Absolute unix ms: the intervals are counted from the first pulse
+    # analyze_counts_parity(reconciled_ms - reconciled_ms[0], 12000)
+
+    # Only one hour of the file, read through its time index (built on first use)
+    # from Dataset import load_time_range
+    # analyze_intervals(load_time_range(file_path, unix_time_stamps[0], unix_time_stamps[0] + 3600, columns='time_since_last', min_time_since_last=14))
+
+    # Same methods in a single pass over the file, for logs too large to load at once
+    # analyze_file_streaming(file_path, [PairParityCounter(), IntervalsCounter(), IntervalsCounter(2), CountsParityCounter(12000)])
+
+    # Parsed values and results cached on disk by file contents (see ResultCache.py), for repeated sessions
+    # from ResultCache import ResultCache
+    # cache = ResultCache()
+    # counts, unix_time_stamps, peak_values, time_stamps, time_since_last = cache.call(extract_values, file_path)
+    # cache.call(count_file, file_path, IntervalsCounter, 2).report()
+    # cache.call(count_file, file_path, CountsParityCounter, 12000).report()
+
+    # Rate changes over the run (see RateMonitor.py)
+    # from RateMonitor import monitor_dataset
+    # print(monitor_dataset(file_path).change_points)
+
+    # Dead time
+    # find_min_and_count(time_since_last)
+
+    # Plot the histogram of peak values
+    # plot_histogram(peak_values, 40)
+
+    # Plot the histogram and average counts
+    interval_minutes = 10
+    max_interval = None
+    # plot_histogram_and_average(time_stamps, counts, interval_minutes, max_interval, zoom=0)
+    # plot_histogram_and_average(time_stamps, counts, interval_minutes, max_interval, zoom=3, num_bins=50)
+
+    # Counts per interval over months of runs, from the store kept by Read_Terminal.py (see CountStore.py)
+    # from CountStore import CountStore
+    # plot_store_counts(CountStore('Data/CountStore'), 60)
 
-# Dead time
-# find_min_and_count(time_since_last)
-
-# Plot the histogram of peak values
-# plot_histogram(peak_values, 40)
-
-# Plot the histogram and average counts
-interval_minutes = 10
-max_interval = None
-# plot_histogram_and_average(time_stamps, counts, interval_minutes, max_interval, zoom=0)
-# plot_histogram_and_average(time_stamps, counts, interval_minutes, max_interval, zoom=3, num_bins=50)
-
-# Show plots
-plt.show()
+    # Show plots
+    plt.show()
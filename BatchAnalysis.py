@@ -0,0 +1,171 @@
+import glob
+import json
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from Analysis import CountsParityCounter, IntervalsCounter, PairParityCounter, ParityCounter
+from Dataset import iter_dataset
+from Exponential import fit_interval_counts
+
+# Columns of the summary table, in order
+SUMMARY_COLUMNS = [
+    'file', 'pulses', 'hours', 'dead_time', 'rate', 'rate_low', 'rate_high',
+    'parity_ones', 'pair_parity_ones', 'pair_parity_lost', 'intervals_ones', 'intervals_lost',
+    'intervals2_ones', 'intervals2_lost', 'counts_parity_odd', 'counts_parity_lost', 'peak_mean', 'peak_std',
+]
+
+
+def discover(data_dir='Data', pattern='GeigerDataset_*.txt'):
+    return sorted(glob.glob(os.path.join(data_dir, pattern)))
+
+
+def analyze_file(file_path, interval_ms=12000, peak_bins=40, peak_range=(700, 800), chunk_bytes=8 * 2**20):
+    """
+    Every analysis method, the dead-time fit and the peak histogram of one dataset, as a summary row.
+    The file is read one chunk at a time, so a worker only holds a chunk and the running totals.
+    """
+    counters = {
+        'parity': ParityCounter(),
+        'pair_parity': PairParityCounter(),
+        'intervals': IntervalsCounter(1),
+        'intervals2': IntervalsCounter(2),
+        'counts_parity': CountsParityCounter(interval_ms),
+    }
+    interval_counts = np.zeros(0, dtype=np.int64)  # Number of intervals of each length (ms), for the fit
+    peak_histogram = np.zeros(peak_bins, dtype=np.int64)
+    peak_sum = peak_squares = 0.0
+    pulses = 0
+    first_time_stamp = last_time_stamp = None
+
+    for records in iter_dataset(file_path, chunk_bytes=chunk_bytes):
+        if len(records) == 0:
+            continue
+        # The analysis methods discard the pulses inside the dead time, as extract_values does
+        kept = records[records['time_since_last'] >= 14]
+        for counter in counters.values():
+            counter.update(kept[counter.column])
+
+        counts = np.bincount(records['time_since_last'])
+        if len(counts) > len(interval_counts):
+            interval_counts = np.concatenate((interval_counts, np.zeros(len(counts) - len(interval_counts), dtype=np.int64)))
+        interval_counts[:len(counts)] += counts
+
+        peaks = records['peak'].astype(np.float64)
+        peak_histogram += np.histogram(peaks, bins=peak_bins, range=peak_range)[0]
+        peak_sum += peaks.sum()
+        peak_squares += np.dot(peaks, peaks)
+        pulses += len(records)
+        if first_time_stamp is None:
+            first_time_stamp = int(records['time_stamp'][0])
+        last_time_stamp = int(records['time_stamp'][-1])
+
+    if pulses == 0:
+        raise ValueError("no pulses")
+    summary = {name: counter.summary() for name, counter in counters.items()}
+    fit = fit_interval_counts(interval_counts)
+    peak_mean = peak_sum / pulses
+
+    return {
+        'file': os.path.basename(file_path),
+        'pulses': pulses,
+        'hours': (last_time_stamp - first_time_stamp) / 3.6e6,
+        'dead_time': fit['dead_time'],
+        'rate': fit['rate'],
+        'rate_low': fit['rate_ci'][0],
+        'rate_high': fit['rate_ci'][1],
+        'parity_ones': summary['parity']['ones'],
+        'pair_parity_ones': summary['pair_parity']['ones'],
+        'pair_parity_lost': summary['pair_parity']['lost'],
+        'intervals_ones': summary['intervals']['ones'],
+        'intervals_lost': summary['intervals']['lost'],
+        'intervals2_ones': summary['intervals2']['ones'],
+        'intervals2_lost': summary['intervals2']['lost'],
+        'counts_parity_odd': summary['counts_parity']['odd'],
+        'counts_parity_lost': summary['counts_parity']['lost'],
+        'peak_mean': peak_mean,
+        'peak_std': float(np.sqrt(max(0.0, peak_squares / pulses - peak_mean ** 2))),
+        'peak_histogram': peak_histogram.tolist(),
+    }
+
+
+def _file_key(file_path):
+    """A file is analyzed again only if its size or modification time changed."""
+    stat = os.stat(file_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def run_batch(file_paths, cache_path='Data/batch_results.json', workers=None, **options):
+    """
+    Analyzes every dataset in a process pool and returns the summary rows in the order of file_paths.
+    Results are cached in cache_path with the file size and modification time and the options, so files already
+    analyzed and unchanged are skipped. The cache is written as each file completes, so an interrupted batch keeps
+    the files it finished. Files that fail (e.g. empty) are reported and left out.
+    """
+    options = json.loads(json.dumps(options))  # As stored in the cache (tuples become lists)
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path) as file:
+            cache = json.load(file)
+
+    def cached(path):
+        return path in cache and cache[path]['key'] == _file_key(path) and cache[path].get('options') == options
+
+    pending = [path for path in file_paths if not cached(path)]
+
+    def store(path, row):
+        cache[path] = {'key': _file_key(path), 'options': options, 'result': row}
+        # Replaced in one step, so an interruption leaves the previous cache rather than a partial file
+        temporary = cache_path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump(cache, file)
+        os.replace(temporary, cache_path)
+
+    if len(pending) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(analyze_file, path, **options): path for path in pending}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    store(path, future.result())
+                except Exception as e:
+                    print(f"Error analyzing {path}: {e}")
+    else:
+        for path in pending:
+            try:
+                store(path, analyze_file(path, **options))
+            except Exception as e:
+                print(f"Error analyzing {path}: {e}")
+
+    # Files that could not be analyzed (with these options) are left out of the table
+    return [cache[path]['result'] for path in file_paths if cached(path)]
+
+
+def write_summary(rows, output_path):
+    """Writes the summary table as CSV."""
+    with open(output_path, "w") as file:
+        file.write(",".join(SUMMARY_COLUMNS) + "\n")
+        for row in rows:
+            file.write(",".join(f'"{row[c]}"' if c == 'file' else f"{row[c]:.6g}" for c in SUMMARY_COLUMNS) + "\n")
+
+
+def print_summary(rows):
+    print(f"{'file':<44} {'pulses':>9} {'hours':>7} {'dead':>5} {'rate':>8} {'int. 1s':>8} {'pair 1s':>8} {'odd cnt':>8} {'peak':>7}")
+    for row in rows:
+        print(f"{row['file']:<44} {row['pulses']:>9} {row['hours']:>7.2f} {row['dead_time']:>5} {row['rate']:>8.4f} "
+              f"{row['intervals_ones']:>7.3f}% {row['pair_parity_ones']:>7.3f}% {row['counts_parity_odd']:>7.3f}% {row['peak_mean']:>7.1f}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Analyze every GeigerDataset in a directory and summarize the results.")
+    parser.add_argument('data_dir', nargs='?', default='Data')
+    parser.add_argument('--output', default=None, help="summary CSV (default: <data_dir>/summary.csv)")
+    parser.add_argument('--interval', type=int, default=12000, help="counts parity interval (ms)")
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    file_paths = discover(args.data_dir)
+    rows = run_batch(file_paths, os.path.join(args.data_dir, 'batch_results.json'), args.workers, interval_ms=args.interval)
+    write_summary(rows, args.output or os.path.join(args.data_dir, 'summary.csv'))
+    print_summary(rows)
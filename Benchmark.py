@@ -0,0 +1,198 @@
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+import numpy as np
+from datetime import datetime as date
+from Analysis import analyze_counts_parity, analyze_intervals, analyze_pair_parity, analyze_parity, extract_values
+from ConvertToBinary import StreamingExtractor, intervals_binary, pair_parity_binary, parity_binary
+from Dataset import PULSE_DTYPE, load_dataset, synthetic_dataset
+from Exponential import generate_exponential_random
+from Poisson import update_poisson_plot
+
+SIZES = [10**4, 10**5, 10**6, 10**7]
+GUI_BATCH = 10000  # Pulses read per GUI update, as at a few thousand counts per second
+
+
+def dataset_path(num_pulses, folder='Data/benchmark', seed=0):
+    """Synthetic GeigerDataset of num_pulses pulses, written once and reused by later runs."""
+    file_path = os.path.join(folder, f"synthetic_{num_pulses}_{seed}.txt")
+    if os.path.exists(file_path):
+        return file_path
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    temporary = file_path + ".tmp"
+    with open(temporary, "w") as file:
+        last_time_stamp = 0
+        for start in range(0, num_pulses, 10**6):
+            records = synthetic_dataset(min(10**6, num_pulses - start), seed=rng)
+            records['count'] += start
+            records['time_stamp'] += last_time_stamp
+            records['unix_time'] = 1716500000 + records['time_stamp'] // 1000
+            last_time_stamp = int(records['time_stamp'][-1])
+            flat = np.column_stack([records[name] for name in PULSE_DTYPE.names]).ravel().tolist()
+            file.write("%d %d %d %d %d\n" * len(records) % tuple(flat))
+    os.replace(temporary, file_path)
+    return file_path
+
+
+def best_time(func, repeat):
+    """Shortest of repeat runs (seconds); printed output of func is discarded."""
+    times = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def streaming_extract(time_since_last, chunk_size=1000):
+    extractor = StreamingExtractor('intervals')
+    for start in range(0, len(time_since_last), chunk_size):
+        extractor.extract(time_since_last[start:start + chunk_size])
+
+
+def benchmarks(file_path, records):
+    """(name, function) of every benchmark on one dataset."""
+    time_since_last = records['time_since_last']
+    time_stamps = records['time_stamp']
+    return [
+        ('extract_values', lambda: extract_values(file_path)),
+        ('analyze_parity', lambda: analyze_parity(time_since_last)),
+        ('analyze_counts_parity', lambda: analyze_counts_parity(time_stamps, 12000)),
+        ('analyze_pair_parity', lambda: analyze_pair_parity(time_since_last)),
+        ('analyze_intervals', lambda: analyze_intervals(time_since_last)),
+        ('parity_binary', lambda: parity_binary(time_since_last)),
+        ('pair_parity_binary', lambda: pair_parity_binary(time_since_last)),
+        ('intervals_binary', lambda: intervals_binary(time_since_last)),
+        ('streaming_extract', lambda: streaming_extract(time_since_last)),
+        ('update_poisson_plot', lambda: update_poisson_plot(time_stamps, 1.5)),
+        ('generate_exponential_random', lambda: generate_exponential_random(time_since_last, 3.0)),
+    ]
+
+
+class GuiBenchmark:
+    """
+    Drives the update functions of the live window without a display (offscreen Qt platform): the pulses are put
+    in the window's ring buffer GUI_BATCH at a time and each update is timed, then an update with no new pulses
+    shows the cost that grows with the pulses already shown.
+    """
+
+    def __init__(self):
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PyQt5 import QtWidgets
+        from EventSource import SyntheticSource
+        from Read_Terminal import SerialHistogram
+
+        self.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+        self.SerialHistogram = SerialHistogram
+        self.SyntheticSource = SyntheticSource
+
+    def run(self, records):
+        # A source without pulses: the window only sees the pulses pushed here
+        window = self.SerialHistogram(None, source=self.SyntheticSource(num_pulses=0))
+        window.timer.stop()
+        try:
+            start = time.perf_counter()
+            for position in range(0, len(records), GUI_BATCH):
+                window.pulseBuffer.extend(records[position:position + GUI_BATCH])
+                window.updateExponential()
+                window.updatePoisson()
+            batches = time.perf_counter() - start
+
+            start = time.perf_counter()
+            window.updateExponential()
+            window.updatePoisson()
+            idle = time.perf_counter() - start
+        finally:
+            window.close()
+            # With a source the window logs to Data/replay and skips the CountStore; the pulses are not kept
+            base = os.path.splitext(window.file.name)[0]
+            for path in (window.file.name, base + ".bin", base + ".idx"):
+                if os.path.exists(path):
+                    os.remove(path)
+            with contextlib.suppress(OSError):
+                os.rmdir(os.path.dirname(window.file.name))  # Only if nothing else was replayed there
+        return [('gui_updates', batches), ('gui_idle_update', idle)]
+
+
+def git_commit():
+    try:
+        directory = os.path.dirname(os.path.realpath(__file__))
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=directory,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes=SIZES, repeat=3, gui=True, folder='Data/benchmark'):
+    """Times every benchmark for each dataset size; returns the results as a JSON-ready dict."""
+    gui_benchmark = None
+    if gui:
+        try:
+            gui_benchmark = GuiBenchmark()
+        except ImportError as e:
+            print(f"GUI updates not timed: {e}")
+
+    results = []
+    for num_pulses in sizes:
+        file_path = dataset_path(num_pulses, folder)
+        # The pulses extract_values keeps, as one structured array
+        records = load_dataset(file_path, min_time_since_last=14)
+        # A single run is enough once a benchmark takes seconds
+        runs = repeat if num_pulses <= 10**6 else 1
+        timings = [(name, best_time(func, runs)) for name, func in benchmarks(file_path, records)]
+        if gui_benchmark is not None:
+            timings += gui_benchmark.run(records)
+        for name, seconds in timings:
+            results.append({'name': name, 'size': num_pulses, 'seconds': seconds, 'pulses_per_second': num_pulses / seconds})
+            print(f"{name:<28} {num_pulses:>10} {seconds * 1000:>12.2f} ms {num_pulses / seconds:>14.3g}/s", flush=True)
+
+    return {
+        'date': date.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': f"{platform.system()} {platform.machine()} {platform.processor()}".strip(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(run, previous):
+    """Prints the time of each benchmark relative to a previous run (above 1 is slower)."""
+    before = {(result['name'], result['size']): result['seconds'] for result in previous['results']}
+    print(f"\nCompared with {previous['date']} ({previous.get('commit')}):")
+    for result in run['results']:
+        seconds = before.get((result['name'], result['size']))
+        if seconds:
+            ratio = result['seconds'] / seconds
+            flag = "  slower" if ratio > 1.2 else "  faster" if ratio < 1 / 1.2 else ""
+            print(f"{result['name']:<28} {result['size']:>10} {ratio:>8.2f}x{flag}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time the parsing, extraction, histogram and live update functions on synthetic datasets.")
+    parser.add_argument('--sizes', type=lambda s: int(float(s)), nargs='+', default=SIZES,
+                        help="numbers of pulses, e.g. 1e4 1e6 1e8 (datasets are kept in --folder)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per benchmark up to 1e6 pulses (the best is kept)")
+    parser.add_argument('--no-gui', action='store_true', help="skip the live window updates")
+    parser.add_argument('--folder', default='Data/benchmark')
+    parser.add_argument('--output', default=None, help="results JSON (default: <folder>/benchmark_<date>.json)")
+    parser.add_argument('--compare', metavar='JSON', default=None, help="previous results to compare with")
+    args = parser.parse_args()
+
+    run = run_benchmarks(args.sizes, args.repeat, not args.no_gui, args.folder)
+    output = args.output or os.path.join(args.folder, f"benchmark_{date.now():%Y-%m-%d_%H%M%S}.json")
+    with open(output, "w") as file:
+        json.dump(run, file, indent=1)
+    print(f"Results written to {output}")
+    if args.compare is not None:
+        with open(args.compare) as file:
+            compare(run, json.load(file))
@@ -0,0 +1,172 @@
+import numpy as np
+from Dataset import load_dataset
+
+# millis() is an unsigned long on the Arduino: it wraps to 0 after 2**32 ms (about 49.7 days)
+WRAP = 2**32
+
+
+def _host_ms(unix_time):
+    # unix_time is the second the batch was read in, so its middle is the unbiased estimate in ms
+    return np.asarray(unix_time, dtype=np.int64) * 1000 + 500
+
+
+def unwrap_time_stamps(time_stamp, unix_time, reset_jump_ms=10 * 1000):
+    """
+    Splits a time_stamp column into Arduino runs and removes the millis() rollovers, with whole-array operations.
+
+    Between consecutive pulses, the Arduino and host clocks must advance by the same amount to within
+    reset_jump_ms (host seconds are coarse and batches are late by the transfer latency). A backwards step of
+    time_stamp that agrees with the host once 2**32 is added is a rollover; any other disagreement is a reset
+    of the Arduino (or a new run appended to the file).
+
+    Returns (unwrapped, segment): the time stamps with 2**32 added after each rollover, and the run number
+    of every pulse.
+    """
+    time_stamp = np.asarray(time_stamp, dtype=np.int64)
+    if time_stamp.size == 0:
+        return time_stamp.copy(), np.zeros(0, dtype=np.int64)
+    step = np.diff(time_stamp)
+    host_step = np.diff(_host_ms(unix_time))
+
+    wrapped = (step < 0) & (np.abs(host_step - (step + WRAP)) <= reset_jump_ms)
+    reset = ~wrapped & (np.abs(host_step - step) > reset_jump_ms)
+
+    segment = np.concatenate(([0], np.cumsum(reset)))
+    # Rollovers are counted from the start of each run
+    wraps = np.concatenate(([0], np.cumsum(wrapped)))
+    run_starts = np.concatenate(([0], np.flatnonzero(reset) + 1))
+    wraps -= wraps[run_starts][segment]
+    return time_stamp + WRAP * wraps, segment
+
+
+def fit_drift(unwrapped, host_ms, knot_interval_ms=60 * 60 * 1000, smoothing=1.0):
+    """
+    Least squares fit of host_ms - unwrapped as a continuous piecewise-linear function of unwrapped, with knots
+    every knot_interval_ms: the offset of the Arduino clock and its slow drift. A weak penalty on the difference of
+    neighbouring knots keeps knots without pulses defined. Returns (knots, offsets at the knots).
+    """
+    unwrapped = np.asarray(unwrapped, dtype=np.int64)
+    start = int(unwrapped[0])
+    position = (unwrapped - start) / knot_interval_ms
+    index = np.minimum(position.astype(np.int64), int(position[-1]))
+    fraction = position - index
+    num_knots = int(position[-1]) + 2
+    residual = (np.asarray(host_ms, dtype=np.int64) - unwrapped).astype(np.float64)
+    base = float(np.median(residual))
+    residual -= base
+
+    # Normal equations of the hat-function basis: a tridiagonal system
+    diagonal = np.bincount(index, (1 - fraction) ** 2, num_knots) + np.bincount(index + 1, fraction ** 2, num_knots)
+    upper = np.bincount(index, (1 - fraction) * fraction, num_knots)[:-1]
+    rhs = np.bincount(index, (1 - fraction) * residual, num_knots) + np.bincount(index + 1, fraction * residual, num_knots)
+    diagonal[:-1] += smoothing
+    diagonal[1:] += smoothing
+    upper -= smoothing
+
+    # Thomas algorithm (one step per knot, not per pulse)
+    c = np.zeros(num_knots - 1)
+    d = np.zeros(num_knots)
+    c[0] = upper[0] / diagonal[0] if num_knots > 1 else 0.0
+    d[0] = rhs[0] / diagonal[0]
+    for i in range(1, num_knots):
+        denominator = diagonal[i] - upper[i - 1] * c[i - 1]
+        if i < num_knots - 1:
+            c[i] = upper[i] / denominator
+        d[i] = (rhs[i] - upper[i - 1] * d[i - 1]) / denominator
+    values = d
+    for i in range(num_knots - 2, -1, -1):
+        values[i] -= c[i] * values[i + 1]
+
+    knots = start + knot_interval_ms * np.arange(num_knots, dtype=np.int64)
+    return knots, values + base
+
+
+def reconcile(time_stamp, unix_time, knot_interval_ms=60 * 60 * 1000, reset_jump_ms=10 * 1000):
+    """
+    Corrected absolute timeline (unix ms, int64) for a time_stamp column: rollovers are removed, every Arduino run
+    is placed on the host clock, and the drift of the Arduino clock is corrected with a piecewise-linear fit.
+    Differences within a run keep the ms resolution of the Arduino.
+
+    Returns (absolute_ms, segments), with a dict per run: first and last pulse index (stop is exclusive),
+    rollovers, mean offset to the host clock, drift (ppm, positive when the Arduino clock runs fast) and the rms
+    residual of the fit (ms, about 289 from the whole-second host times alone).
+    """
+    unwrapped, segment = unwrap_time_stamps(time_stamp, unix_time, reset_jump_ms)
+    host_ms = _host_ms(unix_time)
+    absolute_ms = np.empty(len(unwrapped), dtype=np.int64)
+    segments = []
+    boundaries = np.concatenate(([0], np.flatnonzero(np.diff(segment)) + 1, [len(segment)]))
+    for start, stop in zip(boundaries[:-1].tolist(), boundaries[1:].tolist()):
+        run = unwrapped[start:stop]
+        knots, offsets = fit_drift(run, host_ms[start:stop], knot_interval_ms)
+        offset = np.interp(run, knots, offsets)
+        absolute_ms[start:stop] = run + np.rint(offset).astype(np.int64)
+
+        span = max(1, int(run[-1] - run[0]))
+        residual = host_ms[start:stop] - run - offset
+        segments.append({
+            'start': start,
+            'stop': stop,
+            'rollovers': int((run[-1] - time_stamp[stop - 1]) // WRAP),
+            'offset_ms': float(offset.mean()),
+            'drift_ppm': float((offset[0] - offset[-1]) / span * 1e6),
+            'rms_ms': float(np.sqrt(np.mean(residual ** 2))),
+        })
+    return absolute_ms, segments
+
+
+def reconcile_file(file_path, **options):
+    """reconcile() for a GeigerDataset file (.bin files are memory-mapped)."""
+    unix_time, time_stamp = load_dataset(file_path, columns=['unix_time', 'time_stamp'])
+    return reconcile(time_stamp, unix_time, **options)
+
+
+class StreamingUnwrapper:
+    """
+    Live version of unwrap_time_stamps for the acquisition: turns each batch of time stamps into a monotonic
+    int64 timeline that continues across rollovers and Arduino resets (a new run continues after the host time
+    elapsed since the previous pulse). No drift fit: reconcile() the log afterwards for absolute times.
+    """
+
+    def __init__(self, reset_jump_ms=10 * 1000):
+        self.reset_jump_ms = reset_jump_ms
+        self.last = None  # (time_stamp, unix_time, output) of the previous pulse
+
+    def update(self, time_stamp, unix_time):
+        time_stamp = np.asarray(time_stamp, dtype=np.int64)
+        unix_time = np.asarray(unix_time, dtype=np.int64)
+        if time_stamp.size == 0:
+            return time_stamp.copy()
+
+        prepended = self.last is not None
+        shift = 0
+        if prepended:
+            # The previous pulse is prepended so a rollover or reset between batches is seen
+            time_stamp = np.concatenate(([self.last[0]], time_stamp))
+            unix_time = np.concatenate(([self.last[1]], unix_time))
+            shift = self.last[2] - self.last[0]
+        unwrapped, segment = unwrap_time_stamps(time_stamp, unix_time, self.reset_jump_ms)
+        output = unwrapped + shift
+
+        # Each new run starts where the previous one ended plus the host time in between (at least 1 ms)
+        for start in (np.flatnonzero(np.diff(segment)) + 1).tolist():
+            gap = max(1, int(unix_time[start] - unix_time[start - 1]) * 1000)
+            output[start:] += output[start - 1] + gap - output[start]
+
+        self.last = (int(time_stamp[-1]), int(unix_time[-1]), int(output[-1]))
+        return output[1:] if prepended else output
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Find the Arduino runs, millis() rollovers and clock drift of a GeigerDataset.")
+    parser.add_argument('file_path')
+    parser.add_argument('--knot-hours', type=float, default=1, help="spacing of the drift model knots")
+    args = parser.parse_args()
+
+    absolute_ms, segments = reconcile_file(args.file_path, knot_interval_ms=int(args.knot_hours * 3600 * 1000))
+    for number, run in enumerate(segments):
+        hours = (absolute_ms[run['stop'] - 1] - absolute_ms[run['start']]) / 3.6e6
+        print(f"Run {number}: pulses {run['start']}-{run['stop'] - 1} ({hours:.2f} h), {run['rollovers']} rollovers, "
+              f"drift {run['drift_ppm']:+.1f} ppm, fit rms {run['rms_ms']:.0f} ms")
@@ -0,0 +1,218 @@
+import numpy as np
+from ClockSync import reconcile_file
+from Dataset import iter_dataset
+
+
+def coincidence_pairs(times_a, times_b, window):
+    """
+    Indices (i, j) of every pair with |times_b[j] - times_a[i]| <= window, for sorted time arrays,
+    found with two binary searches per pulse of a instead of comparing every pair.
+    """
+    times_a = np.asarray(times_a)
+    times_b = np.asarray(times_b)
+    low = np.searchsorted(times_b, times_a - window, side='left')
+    high = np.searchsorted(times_b, times_a + window, side='right')
+    partners = high - low
+    i = np.repeat(np.arange(len(times_a)), partners)
+    # j runs from low to high - 1 for every i
+    starts = np.repeat(low - np.concatenate(([0], np.cumsum(partners)[:-1])), partners)
+    j = starts + np.arange(len(i))
+    return i, j
+
+
+def count_coincidences(times_a, times_b, window):
+    """Number of pulses of a with at least one pulse of b within +-window."""
+    low = np.searchsorted(times_b, np.asarray(times_a) - window, side='left')
+    high = np.searchsorted(times_b, np.asarray(times_a) + window, side='right')
+    return int(np.count_nonzero(high > low))
+
+
+def accidental_rate(rate_a, rate_b, window):
+    """
+    Expected rate of chance coincidences within +-window between independent Poisson sources (rates per ms).
+    Times are whole milliseconds, so the window spans 2 * window + 1 possible differences.
+    """
+    return (2 * window + 1) * rate_a * rate_b
+
+
+def difference_histogram(times_a, times_b, max_lag, bin_width=1, chunk_size=2**20):
+    """
+    Histogram of times_b - times_a over [-max_lag, max_lag), in bins of bin_width (the last bin is narrower when
+    bin_width does not divide 2 * max_lag). Pulses of a are taken chunk_size at a time, so memory does not grow
+    with the number of pairs.
+    """
+    num_bins = -(-2 * max_lag // bin_width)
+    histogram = np.zeros(num_bins, dtype=np.int64)
+    times_b = np.asarray(times_b)
+    for start in range(0, len(times_a), chunk_size):
+        chunk = np.asarray(times_a[start:start + chunk_size])
+        i, j = coincidence_pairs(chunk, times_b, max_lag)
+        differences = times_b[j] - chunk[i]
+        bins = (differences[differences < max_lag] + max_lag) // bin_width
+        histogram += np.bincount(bins, minlength=num_bins)
+    return histogram
+
+
+class CoincidenceCounter:
+    """
+    Coincidences between several detectors, fed with chunks of each detector's sorted pulse times (ms, on a
+    common clock) in any order. Pulses are processed as soon as every detector has reported past them, so only
+    about max_lag of each stream is kept in memory.
+
+    For every pair of detectors (a, b), a < b, it counts the pulse pairs within +-window and histograms
+    time_b - time_a over [-max_lag, max_lag) as difference_histogram does. It also counts the pulses of detector 0
+    with a pulse of every other detector within +-window (the coincidences of all detectors).
+    """
+
+    def __init__(self, num_detectors, window=1, max_lag=100, bin_width=1):
+        self.num_detectors = num_detectors
+        self.window = window
+        self.max_lag = max(max_lag, window)
+        self.bin_width = bin_width
+        self.pairs = [(a, b) for a in range(num_detectors) for b in range(a + 1, num_detectors)]
+        self.coincidences = {pair: 0 for pair in self.pairs}
+        self.histograms = {pair: np.zeros(-(-2 * self.max_lag // bin_width), dtype=np.int64) for pair in self.pairs}
+        self.all_coincidences = 0
+
+        self.buffers = [np.zeros(0, dtype=np.int64) for _ in range(num_detectors)]
+        self.last_time = [None] * num_detectors
+        self.finished = [False] * num_detectors
+        self.first_time = [None] * num_detectors
+        self.counts = [0] * num_detectors
+        self.cut = None  # Pulses before this time are processed
+
+    def add(self, detector, times):
+        times = np.asarray(times, dtype=np.int64)
+        if times.size == 0:
+            return
+        if self.first_time[detector] is None:
+            self.first_time[detector] = int(times[0])
+        self.last_time[detector] = int(times[-1])
+        self.counts[detector] += len(times)
+        self.buffers[detector] = np.concatenate((self.buffers[detector], times))
+        self._process()
+
+    def finish(self, detector=None):
+        """Marks a detector's stream (or all of them) as complete, processing whatever it allowed."""
+        for d in range(self.num_detectors) if detector is None else [detector]:
+            self.finished[d] = True
+        self._process()
+
+    def _process(self):
+        # Every pulse before the horizon has arrived; pulses before cut have all their partners within max_lag
+        horizons = [np.inf if self.finished[d] else self.last_time[d] for d in range(self.num_detectors)]
+        if any(h is None for h in horizons):
+            return
+        horizon = min(horizons)
+        cut = horizon if horizon == np.inf else horizon - self.max_lag
+        previous = -np.inf if self.cut is None else self.cut
+        if cut <= previous:
+            return
+
+        new = [(buffer >= previous) & (buffer < cut) for buffer in self.buffers]
+        for a, b in self.pairs:
+            times_a = self.buffers[a][new[a]]
+            times_b = self.buffers[b]
+            histogram = self.histograms[(a, b)]
+            i, j = coincidence_pairs(times_a, times_b, self.max_lag)
+            differences = times_b[j] - times_a[i]
+            self.coincidences[(a, b)] += int(np.count_nonzero(np.abs(differences) <= self.window))
+            bins = (differences[differences < self.max_lag] + self.max_lag) // self.bin_width
+            histogram += np.bincount(bins, minlength=len(histogram))
+
+        reference = self.buffers[0][new[0]]
+        in_all = np.ones(len(reference), dtype=bool)
+        for d in range(1, self.num_detectors):
+            low = np.searchsorted(self.buffers[d], reference - self.window, side='left')
+            high = np.searchsorted(self.buffers[d], reference + self.window, side='right')
+            in_all &= high > low
+        self.all_coincidences += int(np.count_nonzero(in_all))
+
+        # Only the pulses that can still be partners of later ones are kept
+        self.cut = cut
+        if cut != np.inf:
+            self.buffers = [buffer[buffer >= cut - self.max_lag] for buffer in self.buffers]
+
+    def rates(self):
+        """Pulse rate of every detector (per ms) over the span of its stream."""
+        return [count / max(1, last - first + 1) if first is not None else 0.0
+                for count, first, last in zip(self.counts, self.first_time, self.last_time)]
+
+    def summary(self):
+        """Per pair: coincidences, the expected accidentals and the overlap time (ms)."""
+        rates = self.rates()
+        results = []
+        for a, b in self.pairs:
+            overlap = min(self.last_time[a], self.last_time[b]) - max(self.first_time[a], self.first_time[b])
+            expected = accidental_rate(rates[a], rates[b], self.window) * max(0, overlap)
+            results.append({'pair': (a, b), 'coincidences': self.coincidences[(a, b)],
+                            'accidentals': expected, 'overlap_ms': overlap})
+        return results
+
+
+def estimate_host_offset(file_path, chunk_bytes=64 * 2**20):
+    """
+    Offset (ms) from a log's Arduino time_stamp to the host clock: every pulse was logged during the second
+    unix_time, so time_stamp + offset lies in [unix_time * 1000, unix_time * 1000 + 1000) (plus the transfer
+    latency); the intersection of these ranges over the whole log, read chunk_bytes at a time, pins the offset
+    to a few ms. Assumes a single Arduino run without noticeable drift (see ClockSync.reconcile otherwise).
+    """
+    high, low = -np.inf, np.inf
+    for unix_time, time_stamp in iter_dataset(file_path, ['unix_time', 'time_stamp'], chunk_bytes=chunk_bytes):
+        bounds = unix_time * 1000 - time_stamp
+        high, low = max(high, int(bounds.max())), min(low, int(bounds.min()))
+    return (high + low + 1000) // 2
+
+
+def coincidences_in_files(file_paths, window=1, max_lag=100, bin_width=1, offsets=None, reconcile=False,
+                          chunk_bytes=64 * 2**20):
+    """
+    Runs a CoincidenceCounter over GeigerDataset logs of several detectors, one chunk at a time, with
+    time_stamp + offset on the host clock (offsets estimated from unix_time when not given).
+    With reconcile, each log is instead put on the host clock by ClockSync.reconcile (rollovers, resets and
+    drift corrected), which loads the whole time_stamp and unix_time columns of every log.
+    """
+    if reconcile:
+        timelines = [reconcile_file(file_path)[0] for file_path in file_paths]
+        step = max(1, chunk_bytes // 8)
+        streams = [iter([times[start:start + step] for start in range(0, len(times), step)]) for times in timelines]
+        offsets = [0] * len(file_paths)
+    else:
+        if offsets is None:
+            offsets = [estimate_host_offset(file_path, chunk_bytes) for file_path in file_paths]
+        streams = [iter_dataset(file_path, 'time_stamp', chunk_bytes=chunk_bytes) for file_path in file_paths]
+
+    counter = CoincidenceCounter(len(file_paths), window, max_lag, bin_width)
+    active = list(range(len(file_paths)))
+    while active:
+        # Reads from the stream that is furthest behind, so the buffers stay short
+        detector = min(active, key=lambda d: -np.inf if counter.last_time[d] is None else counter.last_time[d])
+        chunk = next(streams[detector], None)
+        if chunk is None:
+            counter.finish(detector)
+            active.remove(detector)
+        else:
+            counter.add(detector, chunk + offsets[detector])
+    return counter
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Coincidences between the logs of several detectors.")
+    parser.add_argument('file_paths', nargs='+')
+    parser.add_argument('--window', type=int, default=1, help="coincidence window (ms, +-)")
+    parser.add_argument('--max-lag', type=int, default=100, help="range of the time-difference histogram (ms, +-)")
+    parser.add_argument('--offsets', type=int, nargs='+', default=None,
+                        help="ms added to each log's time_stamp (default: estimated from unix_time)")
+    parser.add_argument('--reconcile', action='store_true',
+                        help="correct rollovers, Arduino resets and clock drift (loads the logs in memory)")
+    args = parser.parse_args()
+
+    counter = coincidences_in_files(args.file_paths, args.window, args.max_lag, offsets=args.offsets, reconcile=args.reconcile)
+    for result in counter.summary():
+        a, b = result['pair']
+        print(f"D{a}-D{b}: {result['coincidences']} coincidences within +-{args.window} ms, "
+              f"{result['accidentals']:.1f} accidental expected over {result['overlap_ms'] / 3.6e6:.2f} h")
+    if counter.num_detectors > 2:
+        print(f"All {counter.num_detectors} detectors: {counter.all_coincidences}")
@@ -1,76 +1,178 @@
-def extract_last_column_values(file_path):
-    with open(file_path, 'r') as file:
-        lines = file.readlines()
-
-    last_column_values = []
-
-    for line in lines:
-        parts = line.strip().split()
-        last_column_values.append(int(parts[-1]))  # Extracting the last column value
+import numpy as np
+from Dataset import load_dataset
 
-    return last_column_values
+def extract_last_column_values(file_path):
+    # Time since the last pulse, the last column of the GeigerDataset file
+    return load_dataset(file_path, columns='time_since_last')
 
 def parity_binary(values):
-    binary_values = [(1 if value % 2 != 0 else 0) for value in values]
-    return binary_values
+    # 1 for odd values, 0 for even ones
+    values = np.asarray(values)
+    return (values % 2 != 0).astype(np.uint8)
 
 def pair_parity_binary(time_since_last):
-    last_column_values = time_since_last
-
-    ones_count = 0
-    zeros_count = 0
-    numbers = []
-    # Iterate over the values in steps of 2
-    for i in range(0, len(last_column_values) - 1, 2):
-        value1 = last_column_values[i]
-        value2 = last_column_values[i + 1]
-
-        if value1 % 2 != 0 and value2 % 2 == 0:
-            ones_count += 1
-            numbers.append(1)
-        elif value1 % 2 == 0 and value2 % 2 != 0:
-            zeros_count += 1
-            numbers.append(0)
-        # If both are even or both are odd, discard the pair
-
-    return numbers
-
-def intervals_binary(time_since_last, Steps = 1):
-    intervals = time_since_last
+    values = np.asarray(time_since_last)
 
-    ones_count = 0
-    zeros_count = 0
-    numbers = []
-    # Iterate over the intervals in steps of 2
-    for i in range(0, len(intervals) - 1, Steps):
-        delta_t1 = intervals[i]
-        delta_t2 = intervals[i + 1]
+    # Split the values in consecutive pairs, dropping an unpaired last value
+    pairs = values[:len(values) - len(values) % 2].reshape(-1, 2) % 2
 
-        if delta_t1 > delta_t2:
-            numbers.append(1)
-        elif delta_t1 < delta_t2:
-            numbers.append(0)
-        # If delta_t1 == delta_t2, we discard the event
+    # (odd, even) gives 1 and (even, odd) gives 0; if both are even or both are odd, discard the pair
+    kept = pairs[:, 0] != pairs[:, 1]
+    return pairs[kept, 0].astype(np.uint8)
 
-    return numbers
-
-def write_binary_to_file(binary_values, output_file_path):
-    with open(output_file_path, 'w') as file:
-        file.write("".join(map(str, binary_values)) + "\n")  # Writing all values on the same line
-
-def main(input_file_path, output_file_path):
+def intervals_binary(time_since_last, Steps = 1):
+    intervals = np.asarray(time_since_last)
+
+    # Compare intervals i and i + 1 for i = 0, Steps, 2*Steps, ...
+    delta_t1 = intervals[0:len(intervals) - 1:Steps]
+    delta_t2 = intervals[1:len(intervals):Steps]
+
+    # 1 if delta_t1 > delta_t2, 0 if delta_t1 < delta_t2; if delta_t1 == delta_t2, we discard the event
+    kept = delta_t1 != delta_t2
+    return (delta_t1[kept] > delta_t2[kept]).astype(np.uint8)
+
+def bit_statistics(bits, num_values):
+    """Returns (ones_count, zeros_count, lost_percentage) of bits extracted from num_values values."""
+    ones_count = int(np.count_nonzero(bits))
+    zeros_count = len(bits) - ones_count
+    lost_percentage = (num_values - len(bits)) / num_values * 100
+    return ones_count, zeros_count, lost_percentage
+
+def write_binary_to_file(binary_values, output_file_path, format='ascii', append=False):
+    writer = BitStreamWriter(output_file_path, format, append)
+    writer.write(binary_values)
+    writer.close()
+    return writer.bits_written
+
+class BitStreamWriter:
+    """
+    Writes a stream of bits to a file, in one of two formats:
+        'ascii': one '0'/'1' character per bit, all on the same line
+        'raw':   bits packed 8 per byte, most significant bit first, with no header, as read
+                 by the usual randomness test suites (NIST STS, dieharder, ent, ...)
+
+    Bits can be written in several calls; in 'raw' format the bits that do not fill a byte
+    are kept until the next call, and dropped on close.
+    `output` is a file path or an already open binary file object.
+    """
+
+    def __init__(self, output, format='raw', append=False):
+        if format not in ('ascii', 'raw'):
+            raise ValueError(f"Unknown bit stream format: {format}")
+        self.format = format
+        self.owns_file = isinstance(output, str)
+        self.file = open(output, 'ab' if append else 'wb') if self.owns_file else output
+        self.pending_bits = np.zeros(0, dtype=np.uint8)
+        self.bits_written = 0
+
+    def write(self, bits):
+        bits = np.asarray(bits, dtype=np.uint8)
+        if self.format == 'ascii':
+            self.file.write((bits + ord('0')).tobytes())
+            self.bits_written += len(bits)
+            return
+
+        bits = np.concatenate((self.pending_bits, bits))
+        usable = len(bits) - len(bits) % 8
+        self.pending_bits = bits[usable:]
+        self.file.write(np.packbits(bits[:usable]).tobytes())
+        self.bits_written += usable
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if self.format == 'ascii':
+            self.file.write(b"\n")  # Writing all values on the same line
+        if self.owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+# Extraction methods selectable from the command line
+METHODS = {
+    'parity': parity_binary,
+    'pair_parity': pair_parity_binary,
+    'intervals': intervals_binary,
+}
+
+def extract_bits(values, method='intervals', Steps=1):
+    if method == 'intervals':
+        return intervals_binary(values, Steps)
+    return METHODS[method](values)
+
+class StreamingExtractor:
+    """
+    Applies an extraction method to values that arrive in chunks, giving the same bits as
+    extract_bits on all the values at once: a pair or comparison split across two chunks
+    is completed when the next chunk arrives.
+    """
+
+    def __init__(self, method='intervals', Steps=1):
+        if method not in METHODS:
+            raise ValueError(f"Unknown extraction method: {method}")
+        self.method = method
+        self.Steps = Steps
+        self.reset()
+
+    def reset(self):
+        """Start over, e.g. after a gap in the data."""
+        self.num_values = 0
+        self.carry = np.zeros(0, dtype=np.int64)  # Values of the previous chunk still needed
+
+    def extract(self, time_since_last):
+        time_since_last = np.asarray(time_since_last, dtype=np.int64)
+        if self.method == 'parity':
+            self.num_values += len(time_since_last)
+            return parity_binary(time_since_last)
+
+        # Global index of the first value in `values`, so pairs keep their position across chunks
+        offset = self.num_values - len(self.carry)
+        values = np.concatenate((self.carry, time_since_last))
+        self.num_values += len(time_since_last)
+
+        if self.method == 'pair_parity':
+            usable = len(values) - len(values) % 2
+            self.carry = values[usable:]
+            return pair_parity_binary(values[:usable])
+
+        self.carry = values[-1:]
+        return intervals_binary(values[-offset % self.Steps:], self.Steps)
+
+def main(input_file_path, output_file_path, method='intervals', Steps=1, format='ascii', append=False):
     # Step 1: Extract the last column values
     last_column_values = extract_last_column_values(input_file_path)
 
     # Step 2: Transform the values to binary
-    binary_values = intervals_binary(last_column_values)
+    binary_values = extract_bits(last_column_values, method, Steps)
 
     # Step 3: Write the binary values to the output file
-    write_binary_to_file(binary_values, output_file_path)
-
-# Define file paths
-input_file_path = 'Data/GeigerDataset_2024-05-11 09:18:27.155241.txt'
-output_file_path = 'Data/Binary_Intervals.txt'
-
-# Run the main function
-main(input_file_path, output_file_path)
+    bits_written = write_binary_to_file(binary_values, output_file_path, format, append)
+
+    ones_count, zeros_count, lost_percentage = bit_statistics(binary_values, len(last_column_values))
+    print(f"{bits_written} bits written to {output_file_path} ({lost_percentage:.2f}% lost, "
+          f"{ones_count} ones, {zeros_count} zeros)")
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Extract random bits from the intervals of a GeigerDataset file.")
+    parser.add_argument('input_file_path', nargs='?', default='Data/GeigerDataset_2024-05-11 09:18:27.155241.txt')
+    parser.add_argument('output_file_path', nargs='?',
+                        help="defaults to Data/Binary_<method>.txt (ascii) or .bin (raw)")
+    parser.add_argument('--method', choices=METHODS, default='intervals')
+    parser.add_argument('--steps', type=int, default=1, help="step between compared intervals (intervals method)")
+    parser.add_argument('--format', choices=('ascii', 'raw'), default='ascii',
+                        help="'0'/'1' characters, or packed bytes for randomness test suites")
+    parser.add_argument('--append', action='store_true', help="append to the output file instead of overwriting it")
+    args = parser.parse_args()
+
+    output_file_path = args.output_file_path
+    if output_file_path is None:
+        name = ''.join(part.capitalize() for part in args.method.split('_'))
+        if args.method == 'intervals' and args.steps != 1:
+            name += f"_Step{args.steps}"
+        output_file_path = f"Data/Binary_{name}.{'txt' if args.format == 'ascii' else 'bin'}"
+
+    # Run the main function
+    main(args.input_file_path, output_file_path, args.method, args.steps, args.format, args.append)
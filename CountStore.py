@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import numpy as np
+
+# Resolutions of the pre-aggregated levels (ms): 1 s, 10 s, 1 min, 10 min, 1 h
+LEVELS = (1000, 10 * 1000, 60 * 1000, 10 * 60 * 1000, 60 * 60 * 1000)
+
+
+class CountStore:
+    """
+    Persistent pyramid of pulse counts per time bin, one level per resolution in LEVELS.
+
+    Every level is a file of uint32 counts (counts_<resolution>.bin) covering consecutive bins from the
+    origin stored in meta.json, grown in large steps and updated in place through a memory map as pulses
+    arrive. A query for any time range reads only the bins of the coarsest level that fits the requested
+    resolution, so it returns immediately even for datasets spanning months.
+    Times are absolute, in ms (e.g. unix_time * 1000).
+    """
+
+    growth_ms = 24 * 60 * 60 * 1000  # Files grow by at least one day of bins at a time
+
+    def __init__(self, directory, levels=LEVELS):
+        self.directory = directory
+        self.levels = tuple(levels)
+        self.lock = threading.Lock()  # Pulses may be added from the acquisition thread while the GUI queries
+        os.makedirs(directory, exist_ok=True)
+
+        self.meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as file:
+                meta = json.load(file)
+            if tuple(meta['levels']) != self.levels:
+                raise ValueError(f"{directory} was created with levels {meta['levels']}")
+            self.origin_ms = meta['origin_ms']
+            self.last_ms = meta['last_ms']
+        else:
+            self.origin_ms = None
+            self.last_ms = None
+
+        self.counts = {resolution: self._open(resolution) for resolution in self.levels}
+
+    def _path(self, resolution):
+        return os.path.join(self.directory, f"counts_{resolution}.bin")
+
+    def _open(self, resolution):
+        path = self._path(resolution)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=np.uint32)
+        return np.memmap(path, dtype=np.uint32, mode='r+')
+
+    def _grow(self, resolution, num_bins):
+        """Extends a level file with zeros so it holds at least num_bins bins."""
+        current = self.counts[resolution]
+        if num_bins <= len(current):
+            return
+        num_bins = max(num_bins, len(current) + -(-self.growth_ms // resolution))
+        if isinstance(current, np.memmap):
+            current.flush()
+        with open(self._path(resolution), "ab") as file:
+            file.truncate(num_bins * 4)
+        self.counts[resolution] = np.memmap(self._path(resolution), dtype=np.uint32, mode='r+')
+
+    def _set_origin(self, origin_ms):
+        """Moves the origin back (rare: only when older pulses are added), rewriting the level files."""
+        for resolution in self.levels:
+            shift = self.origin_ms // resolution - origin_ms // resolution
+            old = np.array(self.counts[resolution])
+            new = np.zeros(len(old) + shift, dtype=np.uint32)
+            new[shift:] = old
+            self.counts[resolution] = np.zeros(0, dtype=np.uint32)
+            new.tofile(self._path(resolution))
+            self.counts[resolution] = self._open(resolution)
+        self.origin_ms = origin_ms
+
+    def add(self, times_ms):
+        """Counts a batch of pulses at absolute times (ms) in every level."""
+        times_ms = np.asarray(times_ms, dtype=np.int64)
+        if times_ms.size == 0:
+            return
+        with self.lock:
+            first, last = int(times_ms.min()), int(times_ms.max())
+            if self.origin_ms is None:
+                self.origin_ms = first
+                self._write_meta()
+            elif first < self.origin_ms:
+                self._set_origin(first)
+                self._write_meta()
+            self.last_ms = last if self.last_ms is None else max(self.last_ms, last)
+
+            for resolution in self.levels:
+                bins = times_ms // resolution - self.origin_ms // resolution
+                low = int(bins.min())
+                counts = np.bincount(bins - low)
+                self._grow(resolution, low + len(counts))
+                self.counts[resolution][low:low + len(counts)] += counts.astype(np.uint32)
+
+    def submit(self, records):
+        """Listener interface of SerialReader: counts the pulses at their host time."""
+        self.add(records['unix_time'] * 1000)
+
+    def query(self, start_ms, end_ms, resolution_ms):
+        """
+        Counts per bin of resolution_ms between start_ms and end_ms, with bins aligned on multiples of resolution_ms.
+        resolution_ms must be a multiple of the finest level. Returns (bin_start_times_ms, counts).
+        """
+        with self.lock:
+            # Coarsest level that divides the requested resolution
+            level = max(r for r in self.levels if resolution_ms % r == 0)
+            start_ms = start_ms // resolution_ms * resolution_ms
+            end_ms = -(-end_ms // resolution_ms) * resolution_ms
+            group = resolution_ms // level
+
+            counts = np.zeros((end_ms - start_ms) // level, dtype=np.int64)
+            if self.origin_ms is not None:
+                base = self.origin_ms // level
+                first = start_ms // level - base
+                stored = self.counts[level]
+                low, high = max(first, 0), min(first + len(counts), len(stored))
+                if high > low:
+                    counts[low - first:high - first] = stored[low:high]
+
+        times = np.arange(start_ms, end_ms, resolution_ms)
+        return times, counts.reshape(-1, group).sum(axis=1)
+
+    def flush(self):
+        with self.lock:
+            for counts in self.counts.values():
+                if isinstance(counts, np.memmap):
+                    counts.flush()
+            self._write_meta()
+
+    def _write_meta(self):
+        # Written as soon as the origin is known: the level files cannot be read without it
+        with open(self.meta_path, "w") as file:
+            json.dump({'levels': list(self.levels), 'origin_ms': self.origin_ms, 'last_ms': self.last_ms}, file)
+
+    def close(self):
+        self.flush()
+
+
+def build_store(file_paths, directory):
+    """
+    Rebuilds a CountStore from GeigerDataset files, one chunk at a time. The store is built in a fresh directory
+    and then replaces the old one, so the counts never add up with those already in it (e.g. from the GUI).
+    """
+    import shutil
+    from Dataset import iter_dataset
+
+    directory = os.path.normpath(directory)
+    building = directory + ".building"
+    shutil.rmtree(building, ignore_errors=True)
+    store = CountStore(building)
+    for file_path in file_paths:
+        for unix_time in iter_dataset(file_path, 'unix_time'):
+            store.add(unix_time * 1000)
+    store.close()
+    del store  # Releases the memory maps before the files are moved
+
+    old = directory + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(directory):
+        os.replace(directory, old)
+    os.replace(building, directory)
+    shutil.rmtree(old, ignore_errors=True)
+    return CountStore(directory)
+
+
+if __name__ == '__main__':
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description="Build a multi-resolution count store from GeigerDataset files.")
+    parser.add_argument('files', nargs='*', help="defaults to Data/GeigerDataset_*.txt")
+    parser.add_argument('--store', default='Data/CountStore')
+    args = parser.parse_args()
+
+    store = build_store(sorted(args.files or glob.glob('Data/GeigerDataset_*.txt')), args.store)
+    times, counts = store.query(store.origin_ms, store.last_ms + 1, LEVELS[-1])
+    for time_ms, count in zip(times, counts):
+        print(f"{time_ms // 1000:>12} {count:>8}")
@@ -0,0 +1,377 @@
+import os
+import struct
+import numpy as np
+
+# One record per detected pulse, in the same column order as the GeigerDataset text files
+PULSE_DTYPE = np.dtype([
+    ('count', '<i8'),            # Pulse number since the start of the acquisition
+    ('unix_time', '<i8'),        # Host clock when the pulse was read (s)
+    ('peak', '<i4'),             # Peak value (mV)
+    ('time_stamp', '<i8'),       # Arduino time stamp (ms)
+    ('time_since_last', '<i8'),  # Time since the previous pulse (ms)
+])
+
+# Binary dataset layout: a 16 byte header followed by fixed-width PULSE_DTYPE records
+BINARY_MAGIC = b"GEIGERDS"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<8sHH4x")  # magic, version, record size, padding
+
+# Sidecar index of a text dataset (.idx next to the .txt): the byte offset of a line every so often,
+# with the time of the pulse on that line, so a time window can be read without scanning the file
+INDEX_DTYPE = np.dtype([
+    ('offset', '<i8'),      # Byte offset of the start of the line
+    ('unix_time', '<i8'),
+    ('time_stamp', '<i8'),
+])
+INDEX_STEP = 1024  # Pulses between index entries
+
+def _line_validity(buf, num_columns):
+    """
+    Splits a buffer of newline-terminated lines and checks each of them.
+    Returns (line_starts, valid_lines, invalid_lines); blank lines are neither valid nor invalid.
+    """
+    is_digit = (buf >= ord('0')) & (buf <= ord('9'))
+    is_newline = buf == ord('\n')
+    is_space = is_newline | (buf == ord(' ')) | (buf == ord('\t')) | (buf == ord('\r'))
+
+    # First byte of every line (the newline itself belongs to the line it ends)
+    line_starts = np.concatenate(([0], np.flatnonzero(is_newline) + 1))
+    if line_starts[-1] == buf.size:
+        line_starts = line_starts[:-1]
+
+    # A token ends wherever a digit is not followed by another digit
+    token_ends = is_digit & ~np.concatenate((is_digit[1:], [False]))
+    tokens_per_line = np.add.reduceat(token_ends, line_starts, dtype=np.int64)
+
+    # A line is valid if it holds exactly num_columns tokens and nothing but digits and whitespace
+    garbage = ~(is_digit | is_space)
+    if garbage.any():
+        has_garbage = np.add.reduceat(garbage, line_starts, dtype=np.int64) > 0
+    else:
+        has_garbage = np.zeros(len(line_starts), dtype=bool)
+    valid_lines = (tokens_per_line == num_columns) & ~has_garbage
+    invalid_lines = ((tokens_per_line > 0) | has_garbage) & ~valid_lines
+    return line_starts, valid_lines, invalid_lines
+
+
+def parse_int_lines(data, num_columns, return_offsets=False):
+    """
+    Parses a chunk of whitespace-separated, newline-terminated lines of non-negative integers
+    with vectorized operations on the raw bytes.
+
+    Returns (table, malformed): an (n, num_columns) int64 array with one row per valid line,
+    and the number of non-blank lines that were skipped because they did not have exactly
+    `num_columns` integers. With return_offsets, the byte offset of every row's line is returned too.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    empty = np.zeros((0, num_columns), dtype=np.int64)
+    if buf.size == 0:
+        return (empty, 0, np.zeros(0, dtype=np.int64)) if return_offsets else (empty, 0)
+
+    line_starts, valid_lines, invalid_lines = _line_validity(buf, num_columns)
+    malformed = int(np.count_nonzero(invalid_lines))
+    offsets = line_starts[valid_lines]
+    if not valid_lines.any():
+        return (empty, malformed, offsets) if return_offsets else (empty, malformed)
+
+    # Blank out the invalid lines so the remaining bytes are a clean stream of integers
+    if malformed:
+        line_lengths = np.diff(np.append(line_starts, buf.size))
+        buf = np.where(np.repeat(invalid_lines, line_lengths), np.uint8(ord(' ')), buf)
+
+    values = np.fromstring(buf.tobytes(), dtype=np.int64, sep=' ')
+    table = values.reshape(-1, num_columns)
+    return (table, malformed, offsets) if return_offsets else (table, malformed)
+
+
+class BinaryDatasetWriter:
+    """
+    Appends pulse records to a binary GeigerDataset file (.bin).
+
+    The header is written when the file is created; appending to an existing file
+    checks that it has the same record layout.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        exists = os.path.exists(file_path) and os.path.getsize(file_path) > 0
+        if exists:
+            read_binary_header(file_path)
+        self.file = open(file_path, "ab")
+        if not exists:
+            self.file.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, PULSE_DTYPE.itemsize))
+
+    def write(self, records):
+        """Write a structured array of PULSE_DTYPE records."""
+        self.file.write(np.asarray(records, dtype=PULSE_DTYPE).tobytes())
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def index_path(file_path):
+    return os.path.splitext(file_path)[0] + ".idx"
+
+
+class DatasetIndexWriter:
+    """
+    Appends entries to the sidecar index of a text dataset while it is written. An entry is added every `step`
+    pulses, or at the first pulse `interval` seconds after the previous entry, also inside a batch, so a long batch
+    at a high rate does not leave a large gap; the index stays a tiny fraction of the data file.
+    `offset` is the size of the text file when writing starts.
+    """
+
+    def __init__(self, file_path, offset=0, step=INDEX_STEP, interval=60):
+        self.file = open(file_path, "ab" if offset > 0 else "wb")
+        self.offset = offset
+        self.step = step
+        self.interval = interval
+        self.since_last_entry = None
+        self.last_unix_time = None
+
+    def add(self, records, text):
+        """Records a batch of pulses, written to the text file as text (one line per pulse)."""
+        num_records = len(records)
+        if num_records == 0:
+            return
+        unix_time = records['unix_time']
+
+        # Rows of the batch that get an entry (unix_time does not decrease within a batch)
+        rows = []
+        row = 0 if self.since_last_entry is None else max(0, self.step - self.since_last_entry)
+        last_unix_time = self.last_unix_time
+        while True:
+            if last_unix_time is not None:
+                row = min(row, int(np.searchsorted(unix_time, last_unix_time + self.interval, side='left')))
+            if row >= num_records:
+                break
+            rows.append(row)
+            last_unix_time = int(unix_time[row])
+            row += self.step
+
+        data = text.encode() if isinstance(text, str) else text
+        if rows:
+            rows = np.array(rows)
+            newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n"))
+            line_starts = np.concatenate(([0], newlines[:-1] + 1))
+            entries = np.empty(len(rows), dtype=INDEX_DTYPE)
+            entries['offset'] = self.offset + line_starts[rows]
+            entries['unix_time'] = unix_time[rows]
+            entries['time_stamp'] = records['time_stamp'][rows]
+            self.file.write(entries.tobytes())
+            self.since_last_entry = num_records - int(rows[-1])
+            self.last_unix_time = last_unix_time
+        else:
+            self.since_last_entry += num_records
+        self.offset += len(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def build_index(file_path, step=INDEX_STEP, chunk_bytes=64 * 2**20):
+    """(Re)builds the sidecar index of a text dataset offline, with an entry every `step` pulses."""
+    entries = []
+    offset = 0
+    partial_line = b""
+    with open(file_path, "rb") as file:
+        while True:
+            data = file.read(chunk_bytes)
+            chunk = partial_line + data
+            end = len(chunk) if not data else chunk.rfind(b"\n") + 1
+            partial_line = chunk[end:]
+
+            table, _, line_offsets = parse_int_lines(chunk[:end], len(PULSE_DTYPE.names), return_offsets=True)
+            unix_time = PULSE_DTYPE.names.index('unix_time')
+            time_stamp = PULSE_DTYPE.names.index('time_stamp')
+            # Blocks restart at every chunk, so entries are at most `step` pulses apart
+            for row, line_offset in zip(table[::step].tolist(), line_offsets[::step].tolist()):
+                entries.append((offset + line_offset, row[unix_time], row[time_stamp]))
+            offset += end
+            if not data:
+                break
+
+    index = np.array(entries, dtype=INDEX_DTYPE)
+    index.tofile(index_path(file_path))
+    return index
+
+
+def read_index(file_path):
+    """Sidecar index of a text dataset, built first if it is missing or does not match the file."""
+    path = index_path(file_path)
+    if os.path.exists(path):
+        num_entries = os.path.getsize(path) // INDEX_DTYPE.itemsize
+        index = np.fromfile(path, dtype=INDEX_DTYPE, count=num_entries)
+        if num_entries == 0 or index['offset'][-1] < os.path.getsize(file_path):
+            return index
+    return build_index(file_path)
+
+
+def read_binary_header(file_path):
+    """Checks the header of a binary dataset and returns its version."""
+    with open(file_path, "rb") as file:
+        header = file.read(BINARY_HEADER.size)
+    if len(header) < BINARY_HEADER.size:
+        raise ValueError(f"{file_path} is too short to be a binary GeigerDataset")
+
+    magic, version, record_size = BINARY_HEADER.unpack(header)
+    if magic != BINARY_MAGIC:
+        raise ValueError(f"{file_path} is not a binary GeigerDataset")
+    if version != BINARY_VERSION or record_size != PULSE_DTYPE.itemsize:
+        raise ValueError(f"{file_path} has unsupported format version {version} (record size {record_size})")
+    return version
+
+
+def open_binary_dataset(file_path):
+    """
+    Memory-maps a binary GeigerDataset as a read-only structured array of PULSE_DTYPE records.
+    Nothing is read until a column is accessed, so even multi-week files open instantly.
+    A partially written last record (e.g. after a crash) is ignored.
+    """
+    read_binary_header(file_path)
+    num_records = (os.path.getsize(file_path) - BINARY_HEADER.size) // PULSE_DTYPE.itemsize
+    if num_records == 0:
+        return np.zeros(0, dtype=PULSE_DTYPE)
+    return np.memmap(file_path, dtype=PULSE_DTYPE, mode='r', offset=BINARY_HEADER.size, shape=(num_records,))
+
+
+def convert_text_to_binary(text_path, binary_path, chunk_bytes=64 * 2**20):
+    """Converts a text GeigerDataset into the binary format, reading chunk_bytes at a time."""
+    writer = BinaryDatasetWriter(binary_path)
+    try:
+        for records in iter_dataset(text_path, chunk_bytes=chunk_bytes):
+            writer.write(records)
+    finally:
+        writer.close()
+
+
+def _select(records, columns, min_time_since_last):
+    """Applies the dead-time filter and column selection shared by the loaders."""
+    if min_time_since_last is not None:
+        records = records[records['time_since_last'] >= min_time_since_last]
+    if columns is None:
+        return records
+    if isinstance(columns, str):
+        return np.asarray(records[columns])
+    return tuple(np.asarray(records[name]) for name in columns)
+
+
+def _records_from_text(data):
+    table, _ = parse_int_lines(data, len(PULSE_DTYPE.names))
+    records = np.empty(len(table), dtype=PULSE_DTYPE)
+    for i, name in enumerate(PULSE_DTYPE.names):
+        records[name] = table[:, i]
+    return records
+
+
+def iter_dataset(file_path, columns=None, min_time_since_last=None, chunk_bytes=64 * 2**20):
+    """
+    Iterates over a GeigerDataset (.txt or .bin) in chunks of about chunk_bytes, so files
+    that do not fit in memory can be processed. Each chunk is returned as load_dataset would.
+    """
+    if file_path.endswith(".bin"):
+        records = open_binary_dataset(file_path)
+        step = max(1, chunk_bytes // PULSE_DTYPE.itemsize)
+        for start in range(0, len(records), step):
+            yield _select(records[start:start + step], columns, min_time_since_last)
+        return
+
+    partial_line = b""
+    with open(file_path, "rb") as file:
+        while True:
+            data = file.read(chunk_bytes)
+            chunk = partial_line + data
+            end = len(chunk) if not data else chunk.rfind(b"\n") + 1
+            partial_line = chunk[end:]
+            if end > 0:
+                yield _select(_records_from_text(chunk[:end]), columns, min_time_since_last)
+            if not data:
+                break
+
+
+def load_dataset(file_path, columns=None, min_time_since_last=None, chunk_bytes=8 * 2**20):
+    """
+    Loads a GeigerDataset straight into NumPy arrays.
+
+    Text files (`count unix_time peak time_stamp time_since_last` per line) are parsed with vectorized
+    operations chunk_bytes at a time, so the parser's temporary arrays do not grow with the file and only
+    the requested columns are kept; binary files are memory-mapped. Malformed lines are skipped.
+
+    columns: None for a structured array with every column, a column name for a single array,
+        or a list of names for a tuple of arrays in that order (see PULSE_DTYPE for the names).
+    min_time_since_last: when given, pulses with a shorter time_since_last (ms) are dropped,
+        e.g. 14 to discard the pulses inside the Geiger dead time.
+    """
+    if file_path.endswith(".bin"):
+        return _select(open_binary_dataset(file_path), columns, min_time_since_last)
+
+    names = PULSE_DTYPE.names if columns is None else [columns] if isinstance(columns, str) else list(columns)
+    parts = {name: [] for name in names}
+    for records in iter_dataset(file_path, None, min_time_since_last, chunk_bytes):
+        for name in names:
+            parts[name].append(np.ascontiguousarray(records[name]))  # A copy, so the rest of the chunk is freed
+
+    if columns is None:
+        records = np.empty(sum(len(part) for part in parts[names[0]]), dtype=PULSE_DTYPE)
+        for name in names:
+            records[name] = np.concatenate(parts.pop(name)) if records.size else 0
+        return records
+    arrays = [np.concatenate(parts[name]) if parts[name] else np.zeros(0, dtype=PULSE_DTYPE[name]) for name in names]
+    return arrays[0] if isinstance(columns, str) else tuple(arrays)
+
+
+def load_time_range(file_path, start=None, end=None, key='unix_time', columns=None, min_time_since_last=None):
+    """
+    Loads only the pulses with start <= key < end, where key is 'unix_time' (s) or 'time_stamp' (ms),
+    reading a part of the file proportional to the window. Text files are read through their sidecar
+    index (built on first use), binary files by binary search. Assumes key does not decrease along
+    the file, which holds for time_stamp only within a single Arduino run.
+    """
+    if file_path.endswith(".bin"):
+        records = open_binary_dataset(file_path)
+        times = records[key]
+        first = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+        last = len(records) if end is None else int(np.searchsorted(times, end, side='left'))
+        return _select(np.asarray(records[first:last]), columns, min_time_since_last)
+
+    index = read_index(file_path)
+    times = index[key]
+    # From the last entry before start (earlier lines may share its time) to the first entry at or after end
+    first = 0 if start is None else int(np.searchsorted(times, start, side='left')) - 1
+    last = len(index) if end is None else int(np.searchsorted(times, end, side='left'))
+    offset = int(index['offset'][first]) if first >= 0 else 0
+    with open(file_path, "rb") as file:
+        file.seek(offset)
+        data = file.read(int(index['offset'][last]) - offset if last < len(index) else -1)
+
+    records = _records_from_text(data)
+    keep = np.ones(len(records), dtype=bool)
+    if start is not None:
+        keep &= records[key] >= start
+    if end is not None:
+        keep &= records[key] < end
+    return _select(records[keep], columns, min_time_since_last)
+
+
+def synthetic_dataset(num_pulses, rate=3.0, dead_time=14, seed=None, start_unix_time=1716500000):
+    """
+    Generates pulses like the ones of a Geiger tube: exponential intervals for a Poisson source of
+    `rate` counts per second, lengthened by `dead_time` ms, rounded to whole milliseconds as the Arduino does.
+    """
+    rng = np.random.default_rng(seed)
+    intervals = dead_time + np.floor(rng.exponential(1000 / rate, num_pulses)).astype(np.int64)
+    time_stamps = np.cumsum(intervals)
+
+    records = np.empty(num_pulses, dtype=PULSE_DTYPE)
+    records['count'] = np.arange(1, num_pulses + 1)
+    records['unix_time'] = start_unix_time + time_stamps // 1000
+    records['peak'] = rng.normal(750, 15, num_pulses).astype(np.int32)
+    records['time_stamp'] = time_stamps
+    records['time_since_last'] = intervals
+    return records
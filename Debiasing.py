@@ -0,0 +1,102 @@
+import hashlib
+import numpy as np
+
+
+def von_neumann(bits):
+    """One round of Von Neumann: pairs (1, 0) give 1, (0, 1) give 0, equal pairs are discarded."""
+    bits = np.asarray(bits, dtype=np.uint8)
+    pairs = bits[:len(bits) - len(bits) % 2].reshape(-1, 2)
+    return pairs[pairs[:, 0] != pairs[:, 1], 0]
+
+
+def peres(bits, iterations=4):
+    """
+    Iterated Von Neumann (Peres) extractor. Besides the Von Neumann output it recursively extracts
+    from the XOR of every pair and from the value of the discarded equal pairs, recovering most of
+    the bits Von Neumann throws away. Each level costs a few array operations.
+    """
+    bits = np.asarray(bits, dtype=np.uint8)
+    pairs = bits[:len(bits) - len(bits) % 2].reshape(-1, 2)
+    differ = pairs[:, 0] != pairs[:, 1]
+    output = pairs[differ, 0]
+    if iterations <= 1 or len(pairs) < 2:
+        return output
+
+    xors = pairs[:, 0] ^ pairs[:, 1]
+    equal_values = pairs[~differ, 0]
+    return np.concatenate((output, peres(xors, iterations - 1), peres(equal_values, iterations - 1)))
+
+
+def xor_fold(bits, factor=2):
+    """XOR of every `factor` consecutive bits: reduces a bias e to about (2e)^factor / 2, at 1/factor of the rate."""
+    bits = np.asarray(bits, dtype=np.uint8)
+    blocks = bits[:len(bits) - len(bits) % factor].reshape(-1, factor)
+    return np.bitwise_xor.reduce(blocks, axis=1)
+
+
+def hash_condition(bits, input_bits=512, algorithm='sha256'):
+    """
+    Hash-based conditioning: each block of input_bits is replaced by its digest. With SHA-256 and the default
+    512 bit blocks the output has half the bits of the input, each close to full entropy as long as the input
+    carries more than 256 bits of min-entropy per block. Incomplete last blocks are discarded.
+    """
+    packed = np.packbits(np.asarray(bits, dtype=np.uint8)[:len(bits) - len(bits) % input_bits])
+    block_bytes = input_bits // 8
+    data = packed.tobytes()
+    digests = b"".join(hashlib.new(algorithm, data[i:i + block_bytes]).digest()
+                       for i in range(0, len(data), block_bytes))
+    return np.unpackbits(np.frombuffer(digests, dtype=np.uint8))
+
+
+# Post-processing stages selectable by name
+CONDITIONERS = {
+    'none': lambda bits: np.asarray(bits, dtype=np.uint8),
+    'von_neumann': von_neumann,
+    'peres': peres,
+    'xor_fold': xor_fold,
+    'sha256': hash_condition,
+}
+
+
+def condition(bits, method='peres'):
+    return CONDITIONERS[method](bits)
+
+
+def efficiency(num_pulses, bits):
+    """Output bits per detected pulse."""
+    return len(bits) / num_pulses if num_pulses else 0.0
+
+
+def benchmark(num_pulses=10**6, rate=3.0, dead_time=14, seed=0):
+    """
+    Times every extraction method followed by every conditioner on synthetic Poisson data, and returns
+    a list of rows (method, conditioner, bits per pulse, bits per second, ones fraction).
+    """
+    import time
+    from ConvertToBinary import METHODS, extract_bits
+    from Dataset import synthetic_dataset
+
+    time_since_last = synthetic_dataset(num_pulses, rate, dead_time, seed)['time_since_last']
+    rows = []
+    for method in METHODS:
+        for conditioner in CONDITIONERS:
+            start = time.perf_counter()
+            bits = condition(extract_bits(time_since_last, method), conditioner)
+            elapsed = time.perf_counter() - start
+            ones_fraction = np.count_nonzero(bits) / len(bits) if len(bits) else 0.0
+            rows.append((method, conditioner, efficiency(num_pulses, bits), len(bits) / elapsed, ones_fraction))
+    return rows
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the extraction and debiasing methods on synthetic Poisson data.")
+    parser.add_argument('--pulses', type=int, default=10**6)
+    parser.add_argument('--rate', type=float, default=3.0, help="counts per second")
+    parser.add_argument('--dead-time', type=int, default=14, help="ms")
+    args = parser.parse_args()
+
+    print(f"{'method':<12} {'conditioner':<12} {'bits/pulse':>10} {'bits/s':>14} {'ones':>8}")
+    for method, conditioner, bits_per_pulse, bits_per_second, ones_fraction in benchmark(args.pulses, args.rate, args.dead_time):
+        print(f"{method:<12} {conditioner:<12} {bits_per_pulse:>10.4f} {bits_per_second:>14.0f} {ones_fraction:>8.4f}")
@@ -0,0 +1,225 @@
+import os
+import select
+import threading
+import time
+import numpy as np
+from ClockSync import WRAP
+from Dataset import PULSE_DTYPE, iter_dataset, synthetic_dataset
+
+
+class PulseSource:
+    """
+    Stand-in for the serial port of the Arduino: read() returns `peak time_stamp time_since_last` lines as the
+    sketch prints them, each one when its pulse is due. Pulses come `speed` times faster than they were
+    recorded (speed=inf sends them as fast as they are read). Only the part of serial.Serial that SerialReader
+    uses is provided: read(), in_waiting and close().
+
+    Subclasses implement _next_block(), which returns the next pulses (PULSE_DTYPE) or None at the end.
+    """
+
+    def __init__(self, speed=1.0, timeout=1.0, max_bytes=2**20):
+        self.speed = speed
+        self.timeout = timeout
+        self.max_bytes = max_bytes  # Bytes formatted at once when the pulses are due faster than they are read
+        self.pulses_sent = 0
+        self._block = np.zeros(0, dtype=PULSE_DTYPE)
+        self._due_at = np.zeros(0)  # Elapsed ms (at speed 1) when each pulse of the block is due
+        self._position = 0
+        self._elapsed = 0.0  # Pacing time of the last pulse loaded
+        self._last_stamp = None
+        self._output = b""
+        self._start = None
+        self._finished = False
+        self._closed = False
+
+    def _next_block(self):
+        raise NotImplementedError
+
+    def _load(self):
+        """Loads the next block; the pacing follows time_stamp, and a backwards step (rollover or reset) adds no delay."""
+        block = self._next_block()
+        if block is None or len(block) == 0:
+            self._finished = block is None
+            return False
+        stamps = block['time_stamp'].astype(np.int64)
+        previous = stamps[0] if self._last_stamp is None else self._last_stamp
+        steps = np.maximum(np.diff(np.concatenate(([previous], stamps))), 0)
+        self._due_at = self._elapsed + np.cumsum(steps)
+        self._elapsed = float(self._due_at[-1])
+        self._last_stamp = int(stamps[-1])
+        self._block = block
+        self._position = 0
+        return True
+
+    def _now(self):
+        if self._start is None:
+            self._start = time.monotonic()
+        return (time.monotonic() - self._start) * 1000 * self.speed
+
+    def _fill(self):
+        """Formats every pulse due by now (up to max_bytes) into the output buffer."""
+        now = self._now()
+        while len(self._output) < self.max_bytes:
+            if self._position == len(self._block) and (self._finished or not self._load()):
+                break
+            end = int(np.searchsorted(self._due_at, now, side='right'))
+            end = min(end, self._position + max(1, (self.max_bytes - len(self._output)) // 16))
+            if end <= self._position:
+                break
+            pulses = self._block[self._position:end]
+            flat = np.column_stack((pulses['peak'], pulses['time_stamp'], pulses['time_since_last'])).ravel().tolist()
+            self._output += ("%d %d %d\n" * len(pulses) % tuple(flat)).encode()
+            self.pulses_sent += len(pulses)
+            self._position = end
+
+    def _wait(self):
+        """Seconds until the next pulse is due (None when there is none)."""
+        if self._position == len(self._block) and (self._finished or not self._load()):
+            return None
+        return max(0.0, (self._due_at[self._position] - self._now()) / 1000 / self.speed)
+
+    @property
+    def in_waiting(self):
+        self._fill()
+        return len(self._output)
+
+    @property
+    def finished(self):
+        """True once every pulse was read."""
+        return self._finished and self._position == len(self._block) and not self._output
+
+    def read(self, size=1):
+        """Returns up to size bytes, waiting up to timeout for the next pulse as a serial port does."""
+        if self._closed:
+            raise ValueError("read from a closed source")
+        self._fill()
+        if not self._output:
+            wait = self._wait()
+            time.sleep(self.timeout if wait is None else min(wait, self.timeout))
+            self._fill()
+        data, self._output = self._output[:size], self._output[size:]
+        return data
+
+    def close(self):
+        self._closed = True
+
+
+class ReplaySource(PulseSource):
+    """Replays a GeigerDataset (.txt or .bin) with its recorded timing, speed times faster, optionally in a loop."""
+
+    def __init__(self, file_path, speed=1.0, loop=False, timeout=1.0, chunk_bytes=4 * 2**20):
+        super(ReplaySource, self).__init__(speed, timeout)
+        self.file_path = file_path
+        self.loop = loop
+        self.chunk_bytes = chunk_bytes
+        self._chunks = iter_dataset(file_path, chunk_bytes=chunk_bytes)
+
+    def _next_block(self):
+        block = next(self._chunks, None)
+        if block is None and self.loop:
+            self._chunks = iter_dataset(self.file_path, chunk_bytes=self.chunk_bytes)
+            block = next(self._chunks, None)
+        return block
+
+
+class SyntheticSource(PulseSource):
+    """
+    Endless Poisson source of `rate` counts per second with a dead time (Dataset.synthetic_dataset), with time
+    stamps that roll over at 2**32 ms like millis(). num_pulses limits the total (None for no limit).
+    """
+
+    def __init__(self, rate=3.0, dead_time=14, speed=1.0, seed=None, num_pulses=None, timeout=1.0, block_size=2**16):
+        super(SyntheticSource, self).__init__(speed, timeout)
+        self.rate = rate
+        self.dead_time = dead_time
+        self.num_pulses = num_pulses
+        self.block_size = block_size
+        self._rng = np.random.default_rng(seed)
+        self._generated = 0
+        self._time_stamp = 0
+
+    def _next_block(self):
+        size = self.block_size
+        if self.num_pulses is not None:
+            size = min(size, self.num_pulses - self._generated)
+            if size <= 0:
+                return None
+        block = synthetic_dataset(size, self.rate, self.dead_time, seed=self._rng)
+        block['time_stamp'] = (block['time_stamp'].astype(np.int64) + self._time_stamp) % WRAP
+        self._time_stamp = int(block['time_stamp'][-1])
+        self._generated += size
+        return block
+
+
+class PtySerial:
+    """
+    Pseudo-terminal that plays a PulseSource, so the real serial path (pyserial, SerialReader, Recorder,
+    MultiDetector) can be used without hardware: open `port` as if it were the Arduino.
+    """
+
+    def __init__(self, source):
+        import tty
+
+        self.source = source
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)  # No echo or line editing, as on a serial port
+        self.port = os.ttyname(self.slave)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        data = b""
+        while not self._stop_event.is_set():
+            if not data:
+                data = self.source.read(max(1, self.source.in_waiting))
+                continue
+            # Waits while the reader is behind, but still notices stop()
+            _, writable, _ = select.select([], [self.master], [], 0.1)
+            if writable:
+                data = data[os.write(self.master, data):]
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+        self.source.close()
+        os.close(self.master)
+        os.close(self.slave)
+
+
+def open_source(port, baudrate=9600, replay=None, simulate=None, speed=1.0, loop=False, timeout=1):
+    """The serial port of the Arduino, or a ReplaySource of a dataset or a SyntheticSource at `simulate` counts per second."""
+    if replay is not None:
+        return ReplaySource(replay, speed, loop, timeout)
+    if simulate is not None:
+        return SyntheticSource(simulate, speed=speed, timeout=timeout)
+    import serial  # pyserial, only needed for live acquisition
+    return serial.Serial(port, baudrate, timeout=timeout)
+
+
+if __name__ == '__main__':
+    import argparse
+    import signal
+
+    parser = argparse.ArgumentParser(description="Serve a replayed or simulated Geiger counter on a pseudo-terminal.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--replay', metavar='FILE', help="GeigerDataset to replay")
+    group.add_argument('--simulate', metavar='RATE', type=float, help="Poisson source of RATE counts per second")
+    parser.add_argument('--speed', type=float, default=1.0, help="times faster than real time ('inf' for no pacing)")
+    parser.add_argument('--loop', action='store_true', help="replay the file again when it ends")
+    args = parser.parse_args()
+
+    bridge = PtySerial(open_source(None, replay=args.replay, simulate=args.simulate, speed=args.speed, loop=args.loop)).start()
+    print(f"Serving on {bridge.port} (e.g. geiger gui --port {bridge.port}), ^C to stop", flush=True)
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    last_count = 0
+    while not stop_event.wait(10):
+        print(f"{bridge.source.pulses_sent} pulses sent, {(bridge.source.pulses_sent - last_count) / 10:.1f}/s", flush=True)
+        last_count = bridge.source.pulses_sent
+    bridge.stop()
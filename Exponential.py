@@ -1,67 +1,115 @@
+import math
 import numpy as np
-import matplotlib.pyplot as plt
+from statistics import NormalDist
+from Dataset import PULSE_DTYPE, load_dataset
 
 def extract_column(file_path, column_index):
-    # Initialize a list to store the data from the specified column
-    column_data = []
+    # Column of the GeigerDataset file (0-based) as a NumPy array
+    return load_dataset(file_path, columns=PULSE_DTYPE.names[column_index])
+
+def estimate_dead_time(time_since_last, min_fraction=0.5):
+    """
+    Dead time (ms) read from the interval distribution: the density of a dead-time-shifted exponential is highest
+    right after the dead time, so it is the first interval value whose count reaches min_fraction of the most
+    frequent one. Unlike the minimum, this ignores the few spurious short intervals.
+    """
+    counts = np.bincount(np.asarray(time_since_last, dtype=np.int64))
+    return int(np.flatnonzero(counts >= min_fraction * counts.max())[0])
+
+
+def fit_shifted_exponential(time_since_last, dead_time=None, confidence=0.95):
+    """
+    Maximum likelihood fit of intervals = dead_time + Exponential(rate), for intervals floored to whole ms
+    as the Arduino reports them.
+
+    The dead time is estimated with estimate_dead_time unless given. Above it, the floored excess k = interval
+    - dead_time is geometric, P(k) = (1 - q) q**k with q = exp(-rate), so the MLE of the rate (per ms) is
+    log(1 + n / sum(k)); the continuous n / sum(k) would be too high by about rate / 2. The confidence interval
+    comes from the normal interval of the mean excess (variance m (1 + m) / n), on the same scale.
+    Rates are in counts per second: `rate` is the true (dead-time-corrected) rate of the source and
+    `observed_rate` the rate of recorded pulses.
+    """
+    return fit_interval_counts(np.bincount(np.asarray(time_since_last, dtype=np.int64)), dead_time, confidence)
+
+
+def fit_interval_counts(counts, dead_time=None, confidence=0.95):
+    """fit_shifted_exponential from the number of intervals of each length (counts[t] intervals of t ms)."""
+    counts = np.asarray(counts, dtype=np.int64)
+    if dead_time is None:
+        dead_time = int(np.flatnonzero(counts >= 0.5 * counts.max())[0])
+
+    above = counts[dead_time:]
+    n = int(above.sum())
+    total = float(np.dot(np.arange(len(above), dtype=np.int64), above))
+    mean = total / n  # Mean excess over the dead time (ms)
+    rate = 1000 * math.log1p(1 / mean)
+
+    z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+    half_width = z * math.sqrt(mean * (1 + mean) / n)
+    rate_low = 1000 * math.log1p(1 / (mean + half_width))
+    rate_high = 1000 * math.log1p(1 / (mean - half_width)) if mean > half_width else math.inf
+
+    return {
+        'dead_time': dead_time,
+        'num_intervals': n,
+        'rate': rate,
+        'rate_ci': (rate_low, rate_high),
+        'observed_rate': 1000 / (dead_time + mean),
+    }
 
-    # Open the file and read the data
-    with open(file_path, 'r') as file:
-        for line in file:
-            # Split the line into columns based on whitespace
-            columns = line.split()
 
-            # Ensure there are enough columns in the line
-            if len(columns) > column_index:
-                # Append the value from the specified column to the list
-                column_data.append(int(columns[column_index]))
+# Function to estimate lambda and generate exponential random numbers, accounting for dead time
+def generate_exponential_random(data, target_lambda, dead_time=None):
+    data = np.asarray(data)
+    if dead_time is None:
+        dead_time = estimate_dead_time(data)
 
-    return column_data
+    # Adjust for dead time
+    intervals = data[data > dead_time] - dead_time
 
-# Function to estimate lambda and generate exponential random numbers, accounting for dead time
-def generate_exponential_random(data, target_lambda, dead_time=18):
-    sum_intervals = 0
-    intervals = []
-    random_values = []
+    # Running mean interval and lambda estimate after each interval, from cumulative sums
+    mean_interval = np.cumsum(intervals) / np.arange(1, len(intervals) + 1)
+    lambda_estimate = 1.0 / mean_interval
 
-    # Adjust for dead time and update sum of intervals and intervals list
-    for interval in data:
-        if interval > dead_time:
-            adjusted_interval = interval - dead_time
-            intervals.append(adjusted_interval)
-            sum_intervals += adjusted_interval
+    # Scale to target lambda
+    return intervals * (1000 * lambda_estimate / target_lambda)
 
-            # Calculate mean interval and estimate lambda
-            mean_interval = sum_intervals / len(intervals)
-            lambda_estimate = 1.0 / mean_interval
+if __name__ == '__main__':
+    import argparse
+    import matplotlib.pyplot as plt
 
-            # Scale to target lambda
-            scaled_interval = adjusted_interval * (1000 * lambda_estimate / target_lambda)
-            random_values.append(scaled_interval)
+    parser = argparse.ArgumentParser(description="Dead time and rate fit of a GeigerDataset, and exponential random numbers from its intervals.")
+    parser.add_argument('file_path', nargs='?', default='Data/GeigerDataset_2024-05-24 09:31:24.691587.txt')
+    parser.add_argument('--rate', type=float, default=None, help="target counts per second (asked for if not given)")
+    args = parser.parse_args()
 
-    return random_values
+    # File path to the data file
+    file_path = args.file_path
 
-# File path to the data file
-file_path = 'Data/GeigerDataset_2024-05-24 09:31:24.691587.txt'
+    # Extract the 5th column (index 4 as it's 0-based)
+    column_index = 4
+    data = extract_column(file_path, column_index)
 
-# Extract the 5th column (index 4 as it's 0-based)
-column_index = 4
-data = extract_column(file_path, column_index)
+    # Convert the list to a numpy array for further processing if needed
+    data_array = np.array(data)
 
-# Convert the list to a numpy array for further processing if needed
-data_array = np.array(data)
+    # Dead time and rate of the source
+    fit = fit_shifted_exponential(data_array)
+    print(f"Dead time: {fit['dead_time']} ms")
+    print(f"Rate: {fit['rate']:.4f} counts/s (95% CI {fit['rate_ci'][0]:.4f} - {fit['rate_ci'][1]:.4f}), "
+          f"observed {fit['observed_rate']:.4f} counts/s")
 
-# Example target lambda
-target_lambda = float(input("Enter the average number of counts per second: "))
+    # Example target lambda
+    target_lambda = args.rate if args.rate is not None else float(input("Enter the average number of counts per second: "))
 
-# Generate exponential random numbers using the extracted data
-random_numbers = generate_exponential_random(data_array, target_lambda)
+    # Generate exponential random numbers using the extracted data
+    random_numbers = generate_exponential_random(data_array, target_lambda)
 
-# Plot histogram of the generated random numbers using matplotlib
-plt.figure(figsize=(10, 6))
-plt.hist(random_numbers, bins=50, alpha=0.7, edgecolor='black')
+    # Plot histogram of the generated random numbers using matplotlib
+    plt.figure(figsize=(10, 6))
+    plt.hist(random_numbers, bins=50, alpha=0.7, edgecolor='black')
 
-plt.xlabel('Random Number Value')
-plt.ylabel('N')
-plt.title('Histogram of Generated Exponential')
-plt.show()
+    plt.xlabel('Random Number Value')
+    plt.ylabel('N')
+    plt.title('Histogram of Generated Exponential')
+    plt.show()
@@ -0,0 +1,46 @@
+import runpy
+import sys
+
+# Subcommand -> (module run as a script, description). Modules are only imported when their command runs,
+# so e.g. batch jobs never load Qt or matplotlib.
+COMMANDS = {
+    'gui': ('Read_Terminal', "live acquisition window (PyQt5)"),
+    'record': ('Recorder', "headless recorder with file rotation"),
+    'multi': ('MultiDetector', "log several detectors at once"),
+    'source': ('EventSource', "replayed or simulated detector on a pseudo-terminal"),
+    'analyze': ('Analysis', "bit extraction methods on one or two datasets"),
+    'batch': ('BatchAnalysis', "analyze every dataset in a directory"),
+    'convert': ('ConvertToBinary', "extract random bits from a dataset"),
+    'test': ('RandomnessTests', "statistical tests of a bitstream"),
+    'debias': ('Debiasing', "compare the conditioning stages"),
+    'poisson': ('Poisson', "counts per interval against a Poisson distribution"),
+    'exponential': ('Exponential', "dead time and rate fit"),
+    'coincidence': ('Coincidence', "coincidences between detector logs"),
+    'clock': ('ClockSync', "Arduino runs, rollovers and clock drift of a log"),
+    'rates': ('RateMonitor', "count rate changes over a run"),
+    'bench': ('Benchmark', "time the analysis and live update functions"),
+    'store': ('CountStore', "build the multi-resolution count store"),
+}
+
+
+def usage():
+    lines = ["usage: geiger <command> [options]", "", "commands:"]
+    lines += [f"  {name:<12} {description}" for name, (_, description) in COMMANDS.items()]
+    lines += ["", "Run 'geiger <command> -h' for the options of a command."]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        print(usage())
+        return 0 if argv and argv[0] in ('-h', '--help') else 2
+
+    module, _ = COMMANDS[argv[0]]
+    sys.argv = [f"geiger {argv[0]}"] + argv[1:]
+    runpy.run_module(module, run_name='__main__', alter_sys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
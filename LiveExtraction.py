@@ -0,0 +1,116 @@
+import errno
+import fcntl
+import os
+import queue
+import socket
+import stat
+import threading
+import time
+from ConvertToBinary import BitStreamWriter, StreamingExtractor
+
+
+def open_bit_sink(target, stop_event=None):
+    """
+    Opens where the live bits go, as a binary file object:
+        "unix:/path/to/socket"  connects to a listening Unix domain socket
+        path to a FIFO          opens the named pipe for writing (waits for a reader, or returns None
+                                once stop_event is set)
+        any other path          appends to a regular file
+    """
+    if target.startswith("unix:"):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(target[len("unix:"):])
+        return sock.makefile("wb")
+    if os.path.exists(target) and stat.S_ISFIFO(os.stat(target).st_mode):
+        # A non-blocking open fails with ENXIO until a reader opens the FIFO, so the wait can be given up
+        stop_event = stop_event if stop_event is not None else threading.Event()
+        while True:
+            try:
+                fd = os.open(target, os.O_WRONLY | os.O_NONBLOCK)
+                break
+            except OSError as e:
+                if e.errno != errno.ENXIO:
+                    raise
+            if stop_event.wait(0.1):
+                return None
+        fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) & ~os.O_NONBLOCK)
+        return os.fdopen(fd, "wb")
+    return open(target, "ab")
+
+
+class BitExtractionStage(threading.Thread):
+    """
+    Turns pulses into random bits as they are acquired and streams them, packed, to a file, FIFO or socket.
+
+    The acquisition hands over batches of pulses with submit(), which never blocks: batches wait in a
+    bounded queue, and when the sink cannot keep up and the queue is full new batches are dropped
+    (and counted) instead of delaying the acquisition. The extractor restarts after a dropped batch,
+    so no pair is formed across the gap. Bits are flushed at least every max_latency seconds.
+    """
+
+    def __init__(self, target, method='intervals', Steps=1, min_time_since_last=14, max_queued_batches=64, max_latency=0.5):
+        super(BitExtractionStage, self).__init__(daemon=True)
+        self.target = target
+        self.extractor = StreamingExtractor(method, Steps)
+        self.min_time_since_last = min_time_since_last  # Pulses inside the dead time are not used
+        self.max_latency = max_latency
+        self.batches = queue.Queue(maxsize=max_queued_batches)
+        self.dropped_batches = 0
+        self.bits_written = 0
+        self._gap = False
+        self._stop_event = threading.Event()
+
+    def submit(self, records):
+        """Queue a structured array of pulses (PULSE_DTYPE) for extraction, without blocking."""
+        time_since_last = records['time_since_last']
+        if self.min_time_since_last is not None:
+            time_since_last = time_since_last[time_since_last >= self.min_time_since_last]
+        try:
+            self.batches.put_nowait((self._gap, time_since_last.copy()))
+            self._gap = False
+        except queue.Full:
+            self.dropped_batches += 1
+            self._gap = True
+
+    def run(self):
+        try:
+            # Opened here because a FIFO waits for its reader
+            sink = open_bit_sink(self.target, self._stop_event)
+        except OSError as e:
+            print(f"Error opening bit output {self.target}: {e}")
+            return
+        if sink is None:
+            print(f"Bit output {self.target} never got a reader; {self.batches.qsize()} batches not written")
+            return
+        writer = BitStreamWriter(sink, format='raw')
+
+        last_flush = time.time()
+        try:
+            while not (self._stop_event.is_set() and self.batches.empty()):
+                try:
+                    gap, time_since_last = self.batches.get(timeout=self.max_latency)
+                    if gap:
+                        self.extractor.reset()
+                    writer.write(self.extractor.extract(time_since_last))
+                    self.bits_written = writer.bits_written
+                except queue.Empty:
+                    pass
+
+                if time.time() - last_flush >= self.max_latency:
+                    writer.flush()
+                    last_flush = time.time()
+        except (BrokenPipeError, ConnectionError) as e:
+            print(f"Bit output {self.target} closed: {e}")
+        finally:
+            try:
+                writer.close()
+                writer.file.close()
+            except OSError:
+                pass
+
+    def stop(self, timeout=5.0):
+        """Write the queued pulses, then close the output; gives up after timeout s if the sink does not take them."""
+        self._stop_event.set()
+        self.join(timeout)
+        if self.is_alive():
+            print(f"Bit output {self.target} is not being read; abandoned with {self.batches.qsize()} batches queued")
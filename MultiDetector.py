@@ -0,0 +1,160 @@
+import os
+import threading
+import time
+from datetime import datetime as date
+import numpy as np
+from Acquisition import PulseRingBuffer, SerialReader
+from Dataset import PULSE_DTYPE, BinaryDatasetWriter, DatasetIndexWriter, index_path
+from StreamingHistogram import ExponentialAccumulator, PoissonAccumulator
+
+# Pulses of several detectors in one stream: the GeigerDataset columns plus the detector ID and the
+# pulse time on the common host clock (unix ms)
+TAGGED_DTYPE = np.dtype(PULSE_DTYPE.descr + [('detector', '<i2'), ('host_time', '<i8')])
+
+
+class HostClock:
+    """
+    Offset (ms) from an Arduino's time_stamp to the host clock, so pulses of different detectors can be compared.
+
+    A batch is received at least one transfer latency after its newest pulse, so received_ms - time_stamp is
+    the offset plus a positive latency; its minimum over the last one to two windows of window_ms is the
+    estimate (windows keep it following the slow drift of the Arduino clock). A jump by more than
+    max_latency_ms (e.g. the Arduino was reset) restarts the estimate. ClockSync.reconcile does the same offline
+    for the logs, with a fitted drift.
+    """
+
+    def __init__(self, window_ms=60 * 1000, max_latency_ms=5000):
+        self.window_ms = window_ms
+        self.max_latency_ms = max_latency_ms
+        self.offset = None
+        self.current = self.previous = None
+        self.window_start = None
+
+    def update(self, time_stamps, received_ms):
+        candidate = received_ms - int(np.max(time_stamps))
+        if self.offset is not None and abs(candidate - self.offset) > self.max_latency_ms:
+            self.current = self.previous = None
+        if self.current is None or received_ms - self.window_start >= self.window_ms:
+            self.previous, self.current, self.window_start = self.current, candidate, received_ms
+        else:
+            self.current = min(self.current, candidate)
+        self.offset = self.current if self.previous is None else min(self.previous, self.current)
+        return self.offset
+
+
+class LiveHistograms:
+    """Histograms of one detector, updated by its reader thread and read by the GUI (or anyone) at any time."""
+
+    def __init__(self, interval_size=730):
+        self.lock = threading.Lock()
+        self.exponential = ExponentialAccumulator()
+        self.poisson = PoissonAccumulator(interval_size)
+
+    def submit(self, records):
+        with self.lock:
+            self.exponential.add(records['time_since_last'])
+            self.poisson.add(records['time_stamp'])
+
+    def exponentialHistogram(self, num_bins, min_value, max_value):
+        with self.lock:
+            return self.exponential.histogram(num_bins, min_value, max_value)
+
+    def poissonHistogram(self):
+        with self.lock:
+            return self.poisson.histogram()
+
+    def rebin(self, interval_size, time_stamps):
+        with self.lock:
+            self.poisson.rebin(interval_size, time_stamps)
+
+
+class DetectorChannel:
+    """Listener of one detector's SerialReader: tags its pulses with the detector ID and host time and histograms them."""
+
+    def __init__(self, detector, capacity=2**18):
+        self.detector = detector
+        self.clock = HostClock()
+        self.pulseBuffer = PulseRingBuffer(capacity, dtype=TAGGED_DTYPE)
+        self.histograms = LiveHistograms()
+
+    def submit(self, records):
+        offset = self.clock.update(records['time_stamp'], int(time.time() * 1000))
+        tagged = np.empty(len(records), dtype=TAGGED_DTYPE)
+        for name in PULSE_DTYPE.names:
+            tagged[name] = records[name]
+        tagged['detector'] = self.detector
+        tagged['host_time'] = records['time_stamp'] + offset
+        self.pulseBuffer.extend(tagged)
+        self.histograms.submit(records)
+
+
+class DetectorArray:
+    """
+    Reads several detectors at once, one SerialReader thread per serial port, so the throughput grows with
+    the number of ports. Each detector is logged to its own GeigerDataset files (..._D<id>.txt, .bin, .idx),
+    keeps its own live histograms, and its pulses are tagged with the detector ID and the common host clock.
+    """
+
+    def __init__(self, serial_ports, folder='Data'):
+        os.makedirs(folder, exist_ok=True)
+        started = date.today()
+        self.channels = []
+        self.readers = []
+        self.files = []
+        for detector, serial_port in enumerate(serial_ports):
+            file_path = os.path.join(folder, f"GeigerDataset_{started}_D{detector}.txt")
+            file = open(file_path, "w")
+            binary_writer = BinaryDatasetWriter(os.path.splitext(file_path)[0] + ".bin")
+            index_writer = DatasetIndexWriter(index_path(file_path))
+            channel = DetectorChannel(detector)
+            reader = SerialReader(serial_port, None, file, binary_writer, [channel], index_writer=index_writer)
+            self.channels.append(channel)
+            self.readers.append(reader)
+            self.files.append((file_path, file, binary_writer, index_writer))
+
+    def start(self):
+        for reader in self.readers:
+            reader.start()
+
+    def read_new(self):
+        """Pulses of every detector since the previous call (TAGGED_DTYPE), in host time order."""
+        pulses = np.concatenate([channel.pulseBuffer.read_new() for channel in self.channels])
+        return pulses[np.argsort(pulses['host_time'], kind='stable')]
+
+    def stop(self):
+        """Stops the readers, then flushes and closes every log and port."""
+        for reader in self.readers:
+            reader.stop()
+        for reader, (_, file, binary_writer, index_writer) in zip(self.readers, self.files):
+            file.close()
+            binary_writer.close()
+            index_writer.close()
+            reader.serial_port.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    import signal
+    import serial
+
+    parser = argparse.ArgumentParser(description="Log several Geiger counters at once, one file per detector.")
+    parser.add_argument('ports', nargs='+', help="serial ports, detector IDs 0, 1, ... in this order")
+    parser.add_argument('--baudrate', type=int, default=9600)
+    parser.add_argument('--folder', default='Data')
+    parser.add_argument('--status-interval', type=float, default=10, help="seconds between status lines")
+    args = parser.parse_args()
+
+    array = DetectorArray([serial.Serial(port, args.baudrate, timeout=1) for port in args.ports], args.folder)
+    stop_event = threading.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, lambda *_: stop_event.set())
+
+    array.start()
+    try:
+        while not stop_event.wait(args.status_interval):
+            array.read_new()  # Keeps the merged stream drained; a consumer would use these pulses
+            print(f"{date.now():%H:%M:%S}  " + "  ".join(
+                f"D{channel.detector}: {reader.count} pulses (clock offset {channel.clock.offset} ms)"
+                for channel, reader in zip(array.channels, array.readers)), flush=True)
+    finally:
+        array.stop()
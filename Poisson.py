@@ -1,22 +1,12 @@
+import math
 import numpy as np
-import matplotlib.pyplot as plt
+from Dataset import PULSE_DTYPE, load_dataset
+from ClockSync import reconcile_file
+from RandomnessTests import igamc
 
 def extract_column(file_path, column_index):
-    # Initialize a list to store the data from the specified column
-    column_data = []
-
-    # Open the file and read the data
-    with open(file_path, 'r') as file:
-        for line in file:
-            # Split the line into columns based on whitespace
-            columns = line.split()
-
-            # Ensure there are enough columns in the line
-            if len(columns) > column_index:
-                # Append the value from the specified column to the list
-                column_data.append(float(columns[column_index]))
-
-    return column_data
+    # Column of the GeigerDataset file (0-based) as a NumPy array
+    return load_dataset(file_path, columns=PULSE_DTYPE.names[column_index])
 
 def update_poisson_plot(time_stamps, desired_avg_counts):
     """Updates the Poisson plot based on the counts accumulated in fixed time intervals, excluding the last incomplete interval."""
@@ -39,32 +29,127 @@ def update_poisson_plot(time_stamps, desired_avg_counts):
 
         # Calculate the total number of intervals, considering only completed intervals
         num_intervals = int(total_duration // interval_size)
-        counts = [0] * num_intervals
 
         # Count the timestamps in each interval
-        for ts in time_stamps:
-            interval_index = int((ts - first_timestamp) // interval_size)
-            if interval_index < num_intervals:  # This ensures we do not count into the last, potentially unfinished interval
-                counts[interval_index] += 1
+        interval_index = ((np.asarray(time_stamps) - first_timestamp) // interval_size).astype(np.int64)
+        interval_index = interval_index[(interval_index >= 0) & (interval_index < num_intervals)]  # Not the last, potentially unfinished interval
+        counts = np.bincount(interval_index, minlength=num_intervals)
 
         return counts, interval_size
     return [], 0
 
-# Input for desired average counts per interval
-desired_avg_counts = 1.5  # Change this value as needed
-
-# File path to the data file
-file_path = 'Data/GeigerDataset_2024-05-24 09:31:24.691587.txt'
-column_index = 3  # 4th column (0-based index)
-time_stamps = extract_column(file_path, column_index)
-
-counts, interval_size = update_poisson_plot(time_stamps, desired_avg_counts)
-
-# Plot the Poisson distribution using a histogram
-plt.figure(figsize=(10, 6))
-plt.hist(counts, bins=range(0, max(counts) + 2), alpha=0.7, edgecolor='black')
-
-plt.xlabel('Number of Counts per Time Interval')
-plt.ylabel('N')
-plt.title(f'Poisson Distribution of Counts per Interval (Interval Size: {interval_size:.2f} ms)')
-plt.show()
\ No newline at end of file
+def counts_per_interval(sorted_time_stamps, interval_size):
+    """
+    Counts per completed interval of interval_size, starting at the first time stamp, from the positions of the
+    interval boundaries in the sorted time stamps (prefix counts): O(intervals * log n), without re-bucketing every event.
+    """
+    first_timestamp = sorted_time_stamps[0]
+    num_intervals = int((sorted_time_stamps[-1] - first_timestamp) // interval_size)
+    boundaries = first_timestamp + interval_size * np.arange(num_intervals + 1)
+    return np.diff(np.searchsorted(sorted_time_stamps, boundaries, side='left'))
+
+
+def poisson_pmf(k, mean):
+    k = np.asarray(k)
+    log_factorials = np.array([math.lgamma(value + 1) for value in k.ravel()]).reshape(k.shape)
+    return np.exp(k * np.log(mean) - mean - log_factorials)
+
+
+def poisson_chi_square(counts):
+    """
+    Chi-square of the distribution of counts against a Poisson distribution with the same mean.
+    Counts with fewer than 5 expected intervals are merged into their neighbours (the tails are pooled).
+    Returns (chi_square, degrees of freedom, p-value).
+    """
+    mean = counts.mean()
+    observed = np.bincount(counts).astype(np.float64)
+    expected = len(counts) * poisson_pmf(np.arange(len(observed)), mean)
+    expected[-1] += len(counts) - expected.sum()  # Upper tail, so both add up to the number of intervals
+
+    # Merge bins from both ends until every bin expects at least 5 intervals
+    merged_observed, merged_expected = [], []
+    pending_observed = pending_expected = 0.0
+    for o, e in zip(observed, expected):
+        pending_observed += o
+        pending_expected += e
+        if pending_expected >= 5:
+            merged_observed.append(pending_observed)
+            merged_expected.append(pending_expected)
+            pending_observed = pending_expected = 0.0
+    if merged_expected:
+        merged_observed[-1] += pending_observed
+        merged_expected[-1] += pending_expected
+
+    merged_observed, merged_expected = np.array(merged_observed), np.array(merged_expected)
+    chi_square = float(np.sum((merged_observed - merged_expected) ** 2 / merged_expected)) if len(merged_expected) else 0.0
+    dof = len(merged_expected) - 2  # One parameter (the mean) estimated from the data
+    p_value = igamc(dof / 2, chi_square / 2) if dof > 0 else float('nan')
+    return chi_square, dof, p_value
+
+
+def poisson_sweep(time_stamps, desired_avg_counts):
+    """
+    Count distribution, mean, variance and chi-square against the Poisson PMF for several interval sizes,
+    one per desired average count, using one sort of the time stamps for all of them.
+    Returns a list of dicts, one per desired average count.
+    """
+    sorted_time_stamps = np.sort(np.asarray(time_stamps))
+    total_duration = sorted_time_stamps[-1] - sorted_time_stamps[0]
+    event_rate = len(sorted_time_stamps) / total_duration  # Events per millisecond
+
+    results = []
+    for avg_counts in desired_avg_counts:
+        interval_size = avg_counts / event_rate
+        counts = counts_per_interval(sorted_time_stamps, interval_size)
+        chi_square, dof, p_value = poisson_chi_square(counts)
+        results.append({
+            'desired_avg_counts': avg_counts,
+            'interval_size': interval_size,
+            'counts': counts,
+            'mean': counts.mean(),
+            'variance': counts.var(),
+            'chi_square': chi_square,
+            'dof': dof,
+            'p_value': p_value,
+        })
+    return results
+
+
+def print_sweep(results):
+    print(f"{'avg':>6} {'interval (ms)':>14} {'intervals':>10} {'mean':>8} {'variance':>9} {'chi2/dof':>12} {'p-value':>8}")
+    for r in results:
+        print(f"{r['desired_avg_counts']:>6.2f} {r['interval_size']:>14.2f} {len(r['counts']):>10} {r['mean']:>8.4f} "
+              f"{r['variance']:>9.4f} {r['chi_square']:>7.2f}/{r['dof']:<4} {r['p_value']:>8.4f}")
+
+if __name__ == '__main__':
+    import argparse
+    import matplotlib.pyplot as plt
+
+    parser = argparse.ArgumentParser(description="Counts per time interval of a GeigerDataset compared with a Poisson distribution.")
+    parser.add_argument('file_path', nargs='?', default='Data/GeigerDataset_2024-05-24 09:31:24.691587.txt')
+    parser.add_argument('--avg-counts', type=float, default=1.5, help="desired average counts per interval")
+    parser.add_argument('--reconcile', action='store_true',
+                        help="use the corrected timeline (millis() rollovers, Arduino resets and clock drift)")
+    args = parser.parse_args()
+
+    # Input for desired average counts per interval
+    desired_avg_counts = args.avg_counts
+
+    # File path to the data file
+    file_path = args.file_path
+    column_index = 3  # 4th column (0-based index)
+    time_stamps = reconcile_file(file_path)[0] if args.reconcile else extract_column(file_path, column_index)
+
+    counts, interval_size = update_poisson_plot(time_stamps, desired_avg_counts)
+
+    # Compare the counts with a Poisson distribution for a range of interval sizes at once
+    print_sweep(poisson_sweep(time_stamps, np.arange(0.5, 10.5, 0.5)))
+
+    # Plot the Poisson distribution using a histogram
+    plt.figure(figsize=(10, 6))
+    plt.hist(counts, bins=range(0, max(counts) + 2), alpha=0.7, edgecolor='black')
+
+    plt.xlabel('Number of Counts per Time Interval')
+    plt.ylabel('N')
+    plt.title(f'Poisson Distribution of Counts per Interval (Interval Size: {interval_size:.2f} ms)')
+    plt.show()
@@ -0,0 +1,226 @@
+import math
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# Significance level used to mark a test as passed (as in NIST SP 800-22)
+ALPHA = 0.01
+
+
+def igamc(a, x):
+    """Regularized upper incomplete gamma function Q(a, x), used for the chi-square p-values."""
+    if x <= 0:
+        return 1.0
+    if x < a + 1:
+        # Series for the lower function P(a, x)
+        term = total = 1.0 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1.0 - total * math.exp(-x + a * math.log(x) - math.lgamma(a)))
+
+    # Continued fraction for Q(a, x) (modified Lentz)
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    i = 0
+    while True:
+        i += 1
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(-x + a * math.log(x) - math.lgamma(a)) * h
+
+
+def load_bits(file_path, format='raw'):
+    """
+    Loads a bitstream written by ConvertToBinary ('raw': packed bytes, 'ascii': '0'/'1' characters).
+    Returns (packed, num_bits); raw files are memory-mapped.
+    """
+    if format == 'raw':
+        packed = np.memmap(file_path, dtype=np.uint8, mode='r')
+        return packed, len(packed) * 8
+
+    with open(file_path, 'rb') as file:
+        digits = np.frombuffer(file.read(), dtype=np.uint8)
+    bits = digits[(digits == ord('0')) | (digits == ord('1'))] - ord('0')
+    return np.packbits(bits), len(bits)
+
+
+def _segment_statistics(packed, num_bits, remaining_bits, block_size, pattern_length, lags):
+    """
+    Sufficient statistics of one segment of the stream, so segments can be processed in separate processes.
+    `packed` holds the segment followed by the next bits of the stream, taken circularly (the pattern
+    counts wrap around the end of the stream); `remaining_bits` is the length of the stream from the
+    start of the segment, which limits the pairs counted by the runs and autocorrelation tests.
+    """
+    bits = np.unpackbits(packed)
+    segment = bits[:num_bits]
+
+    ones = int(np.count_nonzero(segment))
+
+    # Runs: changes between consecutive bits, including the change into the next segment
+    limit = min(num_bits, remaining_bits - 1)
+    transitions = int(np.count_nonzero(bits[1:limit + 1] != bits[:limit]))
+
+    # Block frequency: segments start on a block boundary, incomplete last blocks are discarded
+    num_blocks = num_bits // block_size
+    proportions = segment[:num_blocks * block_size].reshape(-1, block_size).sum(axis=1, dtype=np.int64) / block_size
+    block_chi_sum = float(np.sum((proportions - 0.5) ** 2))
+
+    # Overlapping patterns of pattern_length bits starting at every position of the segment
+    values = np.zeros(num_bits, dtype=np.uint32)
+    for j in range(pattern_length):
+        values = (values << np.uint32(1)) | bits[j:j + num_bits]
+    pattern_counts = np.bincount(values, minlength=2 ** pattern_length)
+
+    # Autocorrelation: number of positions where the bit differs from the one `lag` positions later
+    differences = []
+    for lag in lags:
+        limit = max(0, min(num_bits, remaining_bits - lag))
+        differences.append(int(np.count_nonzero(bits[:limit] != bits[lag:limit + lag])))
+
+    return ones, transitions, num_blocks, block_chi_sum, pattern_counts, differences
+
+
+def _circular_chunk(packed, num_bits, start, length):
+    """Packed bits start to start + length of the stream, continuing from its beginning past the end."""
+    end = start + length
+    if end <= num_bits:
+        return np.asarray(packed[start // 8:-(-end // 8)])
+    bits = np.unpackbits(np.asarray(packed[start // 8:]))[:num_bits - start]
+    wrap = np.unpackbits(np.asarray(packed[:-(-min(end - num_bits, num_bits) // 8)]))[:num_bits]
+    wrap = np.resize(wrap, end - num_bits)  # Repeats the stream if it is shorter than the wrap
+    return np.packbits(np.concatenate((bits, wrap)))
+
+
+def _counts_for_length(pattern_counts, m):
+    """Counts of the m-bit prefixes, from the counts of longer overlapping patterns."""
+    if m <= 0:
+        return np.zeros(0, dtype=np.int64)
+    return pattern_counts.reshape(2 ** m, -1).sum(axis=1)
+
+
+def run_battery(packed, num_bits, block_size=128, serial_m=8, apen_m=8, lags=range(1, 33),
+                segment_bits=2**22, workers=None):
+    """
+    Runs monobit, runs, block frequency, serial, approximate entropy and autocorrelation tests
+    (NIST SP 800-22 statistics) on a packed bitstream.
+
+    The stream is split in segments of about segment_bits, whose statistics are computed in a process pool
+    and then combined, so the result does not depend on the split. Returns a list of (test name, p-value).
+    """
+    lags = list(lags)
+    pattern_length = max(serial_m, apen_m + 1)
+    tail_bits = max(pattern_length, max(lags, default=0) + 1)
+
+    # Segments start on byte and block boundaries
+    step = 8 * block_size // math.gcd(8, block_size)  # lcm (math.lcm needs Python 3.9)
+    segment_bits = max(step, segment_bits // step * step)
+
+    tasks = []
+    for start in range(0, num_bits, segment_bits):
+        length = min(segment_bits, num_bits - start)
+        chunk = _circular_chunk(packed, num_bits, start, length + tail_bits)
+        tasks.append((chunk, length, num_bits - start, block_size, pattern_length, lags))
+
+    if len(tasks) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_segment_statistics, *zip(*tasks)))
+    else:
+        results = [_segment_statistics(*task) for task in tasks]
+
+    # Combine the statistics of every segment
+    ones = sum(r[0] for r in results)
+    transitions = sum(r[1] for r in results)
+    num_blocks = sum(r[2] for r in results)
+    block_chi_sum = sum(r[3] for r in results)
+    pattern_counts = np.sum([r[4] for r in results], axis=0)
+    differences = np.sum([r[5] for r in results], axis=0) if lags else []
+
+    n = num_bits
+    p_values = []
+
+    # Monobit
+    s_obs = abs(2 * ones - n) / math.sqrt(n)
+    p_values.append(("monobit", math.erfc(s_obs / math.sqrt(2))))
+
+    # Runs (the test is not applicable when the monobit proportion is already too far from 1/2)
+    pi = ones / n
+    if abs(pi - 0.5) >= 2 / math.sqrt(n):
+        p_runs = 0.0
+    else:
+        runs = transitions + 1
+        p_runs = math.erfc(abs(runs - 2 * n * pi * (1 - pi)) / (2 * math.sqrt(2 * n) * pi * (1 - pi)))
+    p_values.append(("runs", p_runs))
+
+    # Block frequency
+    if num_blocks > 0:
+        chi_square = 4 * block_size * block_chi_sum
+        p_values.append((f"block frequency (M={block_size})", igamc(num_blocks / 2, chi_square / 2)))
+
+    # Serial
+    def psi_square(m):
+        if m <= 0:
+            return 0.0
+        counts = _counts_for_length(pattern_counts, m).astype(np.float64)
+        return (2 ** m) / n * float(np.sum(counts ** 2)) - n
+
+    psi_m, psi_m1, psi_m2 = psi_square(serial_m), psi_square(serial_m - 1), psi_square(serial_m - 2)
+    p_values.append((f"serial 1 (m={serial_m})", igamc(2 ** (serial_m - 2), (psi_m - psi_m1) / 2)))
+    p_values.append((f"serial 2 (m={serial_m})", igamc(2 ** (serial_m - 3), (psi_m - 2 * psi_m1 + psi_m2) / 2)))
+
+    # Approximate entropy
+    def phi(m):
+        frequencies = _counts_for_length(pattern_counts, m) / n
+        frequencies = frequencies[frequencies > 0]
+        return float(np.sum(frequencies * np.log(frequencies)))
+
+    approximate_entropy = phi(apen_m) - phi(apen_m + 1)
+    chi_square = 2 * n * (math.log(2) - approximate_entropy)
+    p_values.append((f"approximate entropy (m={apen_m})", igamc(2 ** (apen_m - 1), chi_square / 2)))
+
+    # Autocorrelation
+    for lag, different in zip(lags, differences):
+        z = 2 * (different - (n - lag) / 2) / math.sqrt(n - lag)
+        p_values.append((f"autocorrelation (lag {lag})", math.erfc(abs(z) / math.sqrt(2))))
+
+    return p_values
+
+
+def print_results(p_values, alpha=ALPHA):
+    for name, p_value in p_values:
+        verdict = "PASS" if p_value >= alpha else "FAIL"
+        print(f"{name:<32} p = {p_value:.6f}  {verdict}")
+    passed = sum(p_value >= alpha for _, p_value in p_values)
+    print(f"\n{passed}/{len(p_values)} tests passed at alpha = {alpha}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Statistical randomness tests for a bitstream written by ConvertToBinary.")
+    parser.add_argument('file_path')
+    parser.add_argument('--format', choices=('ascii', 'raw'), default='raw')
+    parser.add_argument('--block-size', type=int, default=128)
+    parser.add_argument('--serial-m', type=int, default=8)
+    parser.add_argument('--apen-m', type=int, default=8)
+    parser.add_argument('--max-lag', type=int, default=32, help="autocorrelation is tested at lags 1 to max-lag")
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    packed, num_bits = load_bits(args.file_path, args.format)
+    print(f"{num_bits} bits from {args.file_path}\n")
+    print_results(run_battery(packed, num_bits, args.block_size, args.serial_m, args.apen_m,
+                              range(1, args.max_lag + 1), workers=args.workers))
@@ -0,0 +1,187 @@
+import math
+import numpy as np
+from Dataset import iter_dataset
+
+# Sliding windows kept by default: name -> window length (ms)
+DEFAULT_SCALES = {
+    '10 s': 10 * 1000,
+    '1 min': 60 * 1000,
+    '10 min': 10 * 60 * 1000,
+    '1 h': 60 * 60 * 1000,
+}
+
+
+class RollingRate:
+    """
+    Count rate over a sliding time window, split in num_buckets buckets. Adding a batch of time stamps
+    costs O(batch + buckets advanced), independent of how many pulses came before.
+    """
+
+    def __init__(self, window_ms, num_buckets=60):
+        self.window_ms = window_ms
+        self.num_buckets = num_buckets
+        self.bucket_ms = max(1, window_ms // num_buckets)
+        self.buckets = np.zeros(num_buckets, dtype=np.int64)
+        self.head = None  # Absolute index (time_stamp // bucket_ms) of the newest bucket
+        self.total = 0
+        self.first_time = None
+        self.last_time = None
+
+    def add(self, time_stamps):
+        time_stamps = np.asarray(time_stamps, dtype=np.int64)
+        if time_stamps.size == 0:
+            return
+        if self.first_time is None:
+            self.first_time = int(time_stamps[0])
+            self.head = int(time_stamps[0]) // self.bucket_ms
+        self.last_time = max(self.last_time or self.first_time, int(time_stamps.max()))
+
+        # Move the window forward, emptying the buckets that leave it
+        newest = self.last_time // self.bucket_ms
+        advance = newest - self.head
+        if advance > 0:
+            cleared = (self.head + 1 + np.arange(min(advance, self.num_buckets))) % self.num_buckets
+            self.total -= int(self.buckets[cleared].sum())
+            self.buckets[cleared] = 0
+            self.head = newest
+
+        # Count the time stamps that are still inside the window
+        indices = time_stamps // self.bucket_ms
+        indices = indices[indices > self.head - self.num_buckets]
+        np.add.at(self.buckets, indices % self.num_buckets, 1)
+        self.total += len(indices)
+
+    def rate(self):
+        """Counts per second over the window (or since the first pulse, if that is more recent)."""
+        if self.first_time is None:
+            return 0.0
+        span = min(self.num_buckets * self.bucket_ms, self.last_time - self.first_time + 1)
+        return 1000 * self.total / span
+
+
+class CusumDetector:
+    """
+    Online two-sided CUSUM on the counts per interval of interval_ms, for a shift of the Poisson rate by
+    a relative amount `shift` up or down. The reference rate is learned from the first `warmup` intervals,
+    and learned again after every detected change. A change is flagged when the log-likelihood ratio
+    accumulated since the CUSUM was last at zero exceeds `threshold`.
+    """
+
+    def __init__(self, interval_ms=10 * 1000, shift=0.2, threshold=12.0, warmup=60):
+        self.interval_ms = interval_ms
+        self.shift = shift
+        self.threshold = threshold
+        self.warmup = warmup
+        self.change_points = []  # (time_stamp of the change, 'up' or 'down', rate before, rate after) in ms and counts/s
+        self.origin = None
+        self.completed = 0  # Intervals already fed to the CUSUM
+        self.open_counts = np.zeros(16, dtype=np.int64)
+        self._restart(0)
+
+    def _restart(self, interval):
+        self.reference = None
+        self.warmup_counts = []
+        self.upper = self.lower = 0.0
+        self.upper_start = self.lower_start = interval
+        self.upper_total = self.lower_total = 0
+
+    def add(self, time_stamps):
+        time_stamps = np.asarray(time_stamps, dtype=np.int64)
+        if time_stamps.size == 0:
+            return
+        if self.origin is None:
+            self.origin = int(time_stamps[0])
+
+        # Counts of the intervals that are still open (late time stamps of completed intervals are dropped)
+        offsets = (time_stamps - self.origin) // self.interval_ms - self.completed
+        offsets = offsets[offsets >= 0]
+        if offsets.size and offsets.max() >= len(self.open_counts):
+            grown = np.zeros(max(2 * len(self.open_counts), int(offsets.max()) + 1), dtype=np.int64)
+            grown[:len(self.open_counts)] = self.open_counts
+            self.open_counts = grown
+        np.add.at(self.open_counts, offsets, 1)
+
+        # Every interval except the one containing the newest time stamp is complete
+        newly_completed = int(offsets.max()) if offsets.size else 0
+        for count in self.open_counts[:newly_completed].tolist():
+            self._update(count)
+            self.completed += 1
+        self.open_counts = np.concatenate((self.open_counts[newly_completed:], np.zeros(newly_completed, dtype=np.int64)))
+
+    def _update(self, count):
+        interval = self.completed
+        if self.reference is None:
+            self.warmup_counts.append(count)
+            if len(self.warmup_counts) >= self.warmup:
+                self.reference = max(np.mean(self.warmup_counts), 1e-9)
+                self.upper_start = self.lower_start = interval + 1
+            return
+
+        # Log-likelihood ratio of the count for the shifted rates against the reference
+        self.upper += count * math.log(1 + self.shift) - self.shift * self.reference
+        self.lower += count * math.log(1 - self.shift) + self.shift * self.reference
+        self.upper_total += count
+        self.lower_total += count
+        if self.upper <= 0:
+            self.upper, self.upper_start, self.upper_total = 0.0, interval + 1, 0
+        if self.lower <= 0:
+            self.lower, self.lower_start, self.lower_total = 0.0, interval + 1, 0
+
+        if self.upper > self.threshold:
+            self._flag('up', self.upper_start, interval, self.upper_total)
+        elif self.lower > self.threshold:
+            self._flag('down', self.lower_start, interval, self.lower_total)
+
+    def _flag(self, direction, start, end, total):
+        to_rate = 1000 / self.interval_ms
+        rate_after = total / (end - start + 1) * to_rate
+        time_stamp = self.origin + start * self.interval_ms
+        self.change_points.append((time_stamp, direction, self.reference * to_rate, rate_after))
+        self._restart(end + 1)
+
+
+class RateMonitor:
+    """Sliding rates at several time scales plus CUSUM change-point detection, fed with batches of time stamps."""
+
+    def __init__(self, scales=None, **cusum_options):
+        scales = DEFAULT_SCALES if scales is None else scales
+        self.windows = {name: RollingRate(window_ms) for name, window_ms in scales.items()}
+        self.detector = CusumDetector(**cusum_options)
+
+    def add(self, time_stamps):
+        for window in self.windows.values():
+            window.add(time_stamps)
+        self.detector.add(time_stamps)
+
+    def rates(self):
+        """Counts per second for every window."""
+        return {name: window.rate() for name, window in self.windows.items()}
+
+    @property
+    def change_points(self):
+        return self.detector.change_points
+
+
+def monitor_dataset(file_path, chunk_bytes=64 * 2**20, **options):
+    """Runs a RateMonitor over a whole dataset, one chunk at a time, and returns it."""
+    monitor = RateMonitor(**options)
+    for time_stamps in iter_dataset(file_path, 'time_stamp', chunk_bytes=chunk_bytes):
+        monitor.add(time_stamps)
+    return monitor
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Find count rate changes in a GeigerDataset file.")
+    parser.add_argument('file_path')
+    parser.add_argument('--interval', type=float, default=10, help="CUSUM interval (s)")
+    parser.add_argument('--shift', type=float, default=0.2, help="relative rate change to detect")
+    parser.add_argument('--threshold', type=float, default=12.0)
+    args = parser.parse_args()
+
+    monitor = monitor_dataset(args.file_path, interval_ms=int(args.interval * 1000), shift=args.shift, threshold=args.threshold)
+    for time_stamp, direction, before, after in monitor.change_points:
+        print(f"{time_stamp / 1000:>12.1f} s  rate {direction:<4} {before:.4f} -> {after:.4f} counts/s")
+    print(f"{len(monitor.change_points)} rate changes found")
+    print("Rates at the end: " + ", ".join(f"{name}: {rate:.4f}/s" for name, rate in monitor.rates().items()))
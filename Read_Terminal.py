@@ -1,37 +1,58 @@
 import sys
-import serial
 import signal
 import time
 import os
-import numpy as np
 import pyqtgraph as pg
 from pyqtgraph.exporters import ImageExporter
 from PyQt5 import QtWidgets, QtGui, QtCore
 from PyQt5.QtWidgets import QMessageBox
 from collections import deque
 from datetime import datetime as date
+from Acquisition import PulseRingBuffer, SerialReader
+from ClockSync import StreamingUnwrapper
+from CountStore import CountStore
+from Dataset import BinaryDatasetWriter, DatasetIndexWriter, index_path
+from EventSource import open_source
+from LiveExtraction import BitExtractionStage
+from RateMonitor import RateMonitor
+from StreamingHistogram import ExponentialAccumulator, PoissonAccumulator
 
 arduinoPort = "/dev/cu.usbmodemF412FA75E7882"
 # arduinoPort = "/dev/tty.usbmodem1101"
+baudrate = 9600  # Must match Serial.begin() in the Arduino sketch
+bitOutput = None  # Live random bits: a file, a FIFO or "unix:/path/to/socket" (None to disable)
 
 class SerialHistogram(QtWidgets.QWidget):
-    def __init__(self, port, baudrate=9600, parent=None):
+    def __init__(self, port, baudrate=9600, bit_output=None, parent=None, source=None):
         super(SerialHistogram, self).__init__(parent)
-        self.serial_port = serial.Serial(port, baudrate, timeout=1)
-        self.time_differences = deque(maxlen=1000000)
+        # source: anything read like the serial port, e.g. an EventSource.ReplaySource to test without the detector
+        self.simulated = source is not None
+        self.serial_port = source if self.simulated else open_source(port, baudrate)
+        self.pulseBuffer = PulseRingBuffer()
         self.timeStamps = deque(maxlen=1000000)
 
         self.maxXRangeExp = 1000  # Default max X-axis range
         self.numBinsExp = 20 # Default number of bins for Exp
         self.timeIntervalPoisson = 730 # Default time interval for Poisson
+
+        # Histograms updated only with the newly arrived pulses on each tick
+        self.exponentialHistogram = ExponentialAccumulator()
+        self.poissonHistogram = PoissonAccumulator(self.timeIntervalPoisson)
+
+        # Count rate over several time scales and detection of rate changes
+        self.rateMonitor = RateMonitor()
+
+        # Monotonic time stamps for the plots across millis() rollovers and Arduino resets
+        self.unwrapper = StreamingUnwrapper()
         self.setupUi()
-        self.setupSerial()
 
         # Get the directory of the currently running script
         script_directory = os.path.dirname(os.path.realpath(__file__))
 
-        # Define the folder path for saving data
+        # Define the folder path for saving data (replayed or simulated pulses apart, so they are never taken for real data)
         folder_path = os.path.join(script_directory, 'Data')
+        if self.simulated:
+            folder_path = os.path.join(folder_path, 'replay')
 
         # Create the 'Data' directory if it does not exist
         if not os.path.exists(folder_path):
@@ -41,11 +62,38 @@ class SerialHistogram(QtWidgets.QWidget):
         file_path = os.path.join(folder_path, f"GeigerDataset_{date.today()}.txt")
         self.file = open(file_path, "w")
 
+        # Same pulses in the compact binary format, next to the text file
+        self.binaryWriter = BinaryDatasetWriter(os.path.splitext(file_path)[0] + ".bin")
+
+        # Byte offsets of the text file over time, so a time window can be loaded without reading it all
+        self.indexWriter = DatasetIndexWriter(index_path(file_path))
+
+        # Counts per second up to per hour, kept across runs for long-term plots (of the detector only)
+        self.countStore = None
+        listeners = []
+        if not self.simulated:
+            self.countStore = CountStore(os.path.join(folder_path, 'CountStore'))
+            listeners.append(self.countStore)
+
+        # Random bits extracted from the intervals while the pulses arrive
+        self.bitExtraction = None
+        if bit_output is not None:
+            self.bitExtraction = BitExtractionStage(bit_output)
+            self.bitExtraction.start()
+            listeners.append(self.bitExtraction)
+
+        # Pulses are read and logged in the background; the timer only redraws
+        self.serialReader = SerialReader(self.serial_port, self.pulseBuffer, self.file, self.binaryWriter, listeners,
+                                         index_writer=self.indexWriter)
+        self.serialReader.start()
+        self.setupSerial()
 
     def setupUi(self):
         self.setWindowTitle('Geiger Counter')
+        self.outerLayout = QtWidgets.QVBoxLayout()
+        self.setLayout(self.outerLayout)
         self.mainLayout = QtWidgets.QHBoxLayout()
-        self.setLayout(self.mainLayout)
+        self.outerLayout.addLayout(self.mainLayout)
 
         button_style = ("QPushButton {"
                         "background-color: #FFFFFF;"
@@ -130,43 +178,68 @@ class SerialHistogram(QtWidgets.QWidget):
         self.savePlotButtonPoisson.setStyleSheet(button_style)
         self.savePlotButtonPoisson.clicked.connect(self.savePlotPoisson)
 
+        """Acquisition Stats"""
+        self.statsLabel = QtWidgets.QLabel()
+        self.outerLayout.addWidget(self.statsLabel)
+
     def setupSerial(self):
+        self.tickDuration = 0.0  # Seconds taken by the last update
+        self.overrunTicks = 0  # Updates that took longer than the timer interval
         self.timer = pg.QtCore.QTimer()
+        self.timer.timeout.connect(self.startTick)
         self.timer.timeout.connect(self.updateExponential)
         self.timer.timeout.connect(self.updatePoisson)
+        self.timer.timeout.connect(self.endTick)
         self.timer.start(self.timeIntervalPoisson*3)  # Update interval in milliseconds
 
-    def getData(self):
-        try:
-            while self.serial_port.inWaiting() > 0:
-                line = self.serial_port.readline().decode("utf-8").rstrip()
-                if line:
-                    peak, time_stamp, time_since_last_pulse = map(int, line.split())
-
-                    self.time_differences.append(time_since_last_pulse) # ms
-                    self.timeStamps.append(time_stamp)
-
-                    # Write data to file
-                    self.writeDataToFile(peak, time_stamp, time_since_last_pulse)
+    def startTick(self):
+        self.tickStart = time.perf_counter()
 
-            self.file.flush() # Ensure data is written to disk
+    def endTick(self):
+        """Measures the update, to see how many pulses per second the display keeps up with."""
+        self.tickDuration = time.perf_counter() - self.tickStart
+        if self.tickDuration * 1000 > self.timer.interval():
+            self.overrunTicks += 1
 
-        except Exception as e:
-            print(f"Error in getData: {e}")
-
-    def writeDataToFile(self, peak, time_stamp, time_since_last_pulse):
-        """Write acquired data to file."""
-
-        # Unix timestamp in seconds
-        current_time = int(time.time())
-
-        # Format: count; unix_time_seconds (s); peak (mV); time_stamp(μs); time_since_last_pulse (μs)
-        line = f"{len(self.time_differences)} {current_time} {peak} {time_stamp} {time_since_last_pulse}\n"
-        self.file.write(line)
+    def getData(self):
+        """Takes the pulses read by the serial thread since the previous call and adds them to the histograms."""
+        pulses = self.pulseBuffer.read_new()
+        if len(pulses) > 0:
+            time_stamps = self.unwrapper.update(pulses['time_stamp'], pulses['unix_time'])
+            self.timeStamps.extend(time_stamps.tolist())
+            self.exponentialHistogram.add(pulses['time_since_last'])
+            self.poissonHistogram.add(time_stamps)
+            self.rateMonitor.add(time_stamps)
+        self.updateStats()
+
+    def updateStats(self):
+        """Shows how many pulses were read and how many were lost on the way to the plots."""
+        stats = (f"Pulses: {self.serialReader.count}    "
+                 f"Dropped (buffer overrun): {self.pulseBuffer.dropped}    "
+                 f"Malformed lines: {self.serialReader.malformed}    "
+                 f"Update: {self.tickDuration * 1000:.0f} ms (overruns: {self.overrunTicks})")
+        stats += "    Rate " + ", ".join(f"{name}: {rate:.2f}/s" for name, rate in self.rateMonitor.rates().items())
+        change_points = self.rateMonitor.change_points
+        stats += f"    Rate changes: {len(change_points)}"
+        if change_points:
+            time_stamp, direction, before, after = change_points[-1]
+            stats += f" (last {direction} at {time_stamp / 1000:.0f} s: {before:.2f} -> {after:.2f}/s)"
+        if self.bitExtraction is not None:
+            stats += (f"    Random bits: {self.bitExtraction.bits_written}    "
+                      f"Dropped batches: {self.bitExtraction.dropped_batches}")
+        self.statsLabel.setText(stats)
 
     def closeEvent(self, event):
         """Ensures the file is closed properly"""
+        self.timer.stop()
+        self.serialReader.stop()
+        if self.bitExtraction is not None:
+            self.bitExtraction.stop()
         self.file.close()
+        self.binaryWriter.close()
+        self.indexWriter.close()
+        if self.countStore is not None:
+            self.countStore.close()
         self.serial_port.close()
         super(SerialHistogram, self).closeEvent(event)
 
@@ -174,8 +247,8 @@ class SerialHistogram(QtWidgets.QWidget):
     def updateExponential(self):
         """Updates the exponential plot based on the collected time differences."""
         self.getData()
-        if len(self.time_differences) > 0:
-            y, x = np.histogram(list(self.time_differences), bins=self.numBinsExp, range=(12, self.maxXRangeExp))
+        if self.exponentialHistogram.total > 0:
+            y, x = self.exponentialHistogram.histogram(self.numBinsExp, 12, self.maxXRangeExp)
             self.exponentialPlotWidget.clear()
             self.exponentialPlotWidget.plot(x, y, stepMode=True, fillLevel=0, brush=pg.mkBrush('#374c80'))
 
@@ -194,38 +267,22 @@ class SerialHistogram(QtWidgets.QWidget):
     def clearPlotExp(self):
         """Clear the plot and the underlying data."""
         self.exponentialPlotWidget.clear()  # This clears the visual plot
-        self.time_differences.clear()
+        self.exponentialHistogram.reset()
 
 
     def updatePoisson(self):
         """Updates the Poisson plot based on the counts accumulated in fixed time intervals, excluding the last incomplete interval."""
         self.getData()
         if len(self.timeStamps) > 0:
-            interval_size = self.timeIntervalPoisson  # Assume this is set to a value like 1000 milliseconds
+            # Recount the retained time stamps only when the interval size was changed
+            if self.poissonHistogram.interval_size != self.timeIntervalPoisson:
+                self.poissonHistogram.rebin(self.timeIntervalPoisson, self.timeStamps)
 
-            # Determine the time range from the first to the last timestamp
-            first_timestamp = self.timeStamps[0]
-            last_timestamp = self.timeStamps[-1]
-
-            # Calculate the total number of intervals, considering only completed intervals
-            num_intervals = (last_timestamp - first_timestamp) // interval_size
-            counts = [0] * num_intervals
-
-            # Count the timestamps in each interval
-            for ts in self.timeStamps:
-                interval_index = (ts - first_timestamp) // interval_size
-                if interval_index < num_intervals:  # This ensures we do not count into the last, potentially unfinished interval
-                    counts[interval_index] += 1
+            # Frequencies of each count, from 0 to the max number of counts found, excluding the last incomplete interval
+            count_frequencies, bin_edges = self.poissonHistogram.histogram()
 
             # Update the Poisson plot with new data
             self.poissonPlotWidget.clear()
-
-            # Calculate bin edges from 0 to the max number of counts found, plus one extra bin
-            max_count = max(counts) if counts else 0
-            count_bins = np.arange(0, max_count + 2)  # +2 to include the last bin edge
-            count_frequencies, bin_edges = np.histogram(counts, bins=count_bins)
-
-            # Correct plotting call, ensure that data plotted does not include the last incomplete interval
             self.poissonPlotWidget.plot(bin_edges, count_frequencies, stepMode=True, fillLevel=0, brush=pg.mkBrush('#374c80'))
 
     def changeXAxisRangePoisson(self):
@@ -244,6 +301,7 @@ class SerialHistogram(QtWidgets.QWidget):
         """Clear the plot and the underlying data."""
         self.poissonPlotWidget.clear()  # This clears the visual plot
         self.timeStamps.clear()
+        self.poissonHistogram.reset()
 
     def savePlot(self, plotWidget, defaultName="plot"):
         """Save the current plot to a file."""
@@ -278,10 +336,28 @@ class SerialHistogram(QtWidgets.QWidget):
         self.savePlot(self.poissonPlotWidget, "poisson")
 
 if __name__ == '__main__':
-    signal.signal(signal.SIGINT, signal.SIG_DFL) # ^C works this way
-
-    app = QtWidgets.QApplication(sys.argv)
-    window = SerialHistogram(arduinoPort)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Live acquisition window for the Geiger counter.")
+    parser.add_argument('--port', default=arduinoPort)
+    parser.add_argument('--baudrate', type=int, default=baudrate)
+    parser.add_argument('--bit-output', default=bitOutput, help="file, FIFO or unix:/path/to/socket for live random bits")
+    parser.add_argument('--replay', metavar='FILE', default=None, help="replay a GeigerDataset instead of the serial port")
+    parser.add_argument('--simulate', metavar='RATE', type=float, default=None,
+                        help="simulated Poisson source of RATE counts per second instead of the serial port")
+    parser.add_argument('--speed', type=float, default=1.0, help="speed-up of --replay and --simulate")
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv[:1])
+    source = None
+    if args.replay is not None or args.simulate is not None:
+        source = open_source(args.port, args.baudrate, args.replay, args.simulate, args.speed)
+    window = SerialHistogram(args.port, args.baudrate, args.bit_output, source=source)
+
+    # ^C and kill close the window, so the files are flushed and closed by closeEvent
+    # (the update timer hands control back to Python regularly, so the handler runs promptly)
+    signal.signal(signal.SIGINT, lambda *args: window.close())
+    signal.signal(signal.SIGTERM, lambda *args: window.close())
     window.resize(1000, 600)
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
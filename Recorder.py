@@ -0,0 +1,101 @@
+import os
+import signal
+import threading
+import time
+from datetime import datetime as date
+from Acquisition import SerialReader
+from CountStore import CountStore
+from Dataset import BinaryDatasetWriter, DatasetIndexWriter, index_path
+
+
+class RotatingSerialReader(SerialReader):
+    """
+    SerialReader that logs to a new GeigerDataset file (text, binary and index) in `folder` every time the
+    current one reaches max_bytes of text or has been open for max_seconds (either limit may be None).
+    Files are switched between batches in the reader thread, so no pulse is split or lost.
+    """
+
+    def __init__(self, serial_port, folder, max_bytes=None, max_seconds=None, listeners=None, flush_interval=1.0):
+        super(RotatingSerialReader, self).__init__(serial_port, None, listeners=listeners, flush_interval=flush_interval)
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.file_paths = []
+        self.openFiles()
+
+    def openFiles(self):
+        file_path = os.path.join(self.folder, f"GeigerDataset_{date.today()}.txt")
+        self.file = open(file_path, "w")
+        self.binary_writer = BinaryDatasetWriter(os.path.splitext(file_path)[0] + ".bin")
+        self.index_writer = DatasetIndexWriter(index_path(file_path))
+        self.bytes_written = 0
+        self.opened_at = time.time()
+        self.file_paths.append(file_path)
+
+    def closeFiles(self):
+        self.flush()
+        self.file.close()
+        self.binary_writer.close()
+        self.index_writer.close()
+
+    def writeDataToFile(self, records):
+        if ((self.max_bytes is not None and self.bytes_written >= self.max_bytes)
+                or (self.max_seconds is not None and time.time() - self.opened_at >= self.max_seconds)):
+            self.closeFiles()
+            self.openFiles()
+        super(RotatingSerialReader, self).writeDataToFile(records)
+
+
+def record(port, baudrate=9600, folder='Data', max_bytes=None, max_seconds=None, store=True, status_interval=60):
+    """
+    Logs the detector without a display until SIGINT or SIGTERM, then flushes and closes every file.
+    Memory use does not grow with the run: pulses go straight from the serial port to the files.
+    """
+    import serial  # pyserial, only needed for live acquisition
+
+    os.makedirs(folder, exist_ok=True)
+    serial_port = serial.Serial(port, baudrate, timeout=1)
+    count_store = CountStore(os.path.join(folder, 'CountStore')) if store else None
+    reader = RotatingSerialReader(serial_port, folder, max_bytes, max_seconds,
+                                  listeners=[count_store] if count_store is not None else [])
+
+    stop_event = threading.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, lambda *args: stop_event.set())
+
+    print(f"Recording {port} to {reader.file_paths[-1]}")
+    reader.start()
+    last_count = 0
+    try:
+        # The main thread only wakes up for the status line (or when the reader stops on a serial error)
+        while not stop_event.wait(status_interval) and reader.is_alive():
+            rate = (reader.count - last_count) / status_interval
+            last_count = reader.count
+            print(f"{date.now():%Y-%m-%d %H:%M:%S}  pulses: {reader.count}  rate: {rate:.3f}/s  "
+                  f"malformed lines: {reader.malformed}  file: {os.path.basename(reader.file_paths[-1])}", flush=True)
+    finally:
+        reader.stop()
+        reader.closeFiles()
+        if count_store is not None:
+            count_store.close()
+        serial_port.close()
+        print(f"Stopped after {reader.count} pulses in {len(reader.file_paths)} file(s)")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Headless recorder: logs the Geiger counter to rotating GeigerDataset files.")
+    parser.add_argument('port', help="serial port of the Arduino, e.g. /dev/ttyACM0")
+    parser.add_argument('--baudrate', type=int, default=9600, help="must match Serial.begin() in the Arduino sketch")
+    parser.add_argument('--folder', default='Data')
+    parser.add_argument('--max-mb', type=float, default=None, help="start a new file after this many MB of text")
+    parser.add_argument('--max-hours', type=float, default=24, help="start a new file after this many hours (0 to disable)")
+    parser.add_argument('--no-store', action='store_true', help="do not update the multi-resolution count store")
+    parser.add_argument('--status-interval', type=float, default=60, help="seconds between status lines")
+    args = parser.parse_args()
+
+    record(args.port, args.baudrate, args.folder,
+           int(args.max_mb * 2**20) if args.max_mb else None,
+           args.max_hours * 3600 if args.max_hours else None,
+           not args.no_store, args.status_interval)
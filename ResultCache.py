@@ -0,0 +1,121 @@
+import functools
+import hashlib
+import json
+import os
+import pickle
+import types
+
+
+def _code_description(code):
+    """
+    Bytecode with the constants and names it uses, including those of nested functions and comprehensions:
+    the bytecode alone is the same for e.g. x >= 14 and x >= 18.
+    """
+    constants = tuple(_code_description(const) if isinstance(const, types.CodeType) else const for const in code.co_consts)
+    return repr((code.co_code, constants, code.co_names))
+
+
+class ResultCache:
+    """
+    On-disk memoization of analysis results, for functions whose first argument is a dataset path.
+
+    A result is stored under a key made of the content hash of the dataset, the function name (and
+    bytecode, constants and default arguments, so editing the function invalidates it) and the repr of the other arguments, which must
+    therefore identify them (numbers, strings, classes; not arrays). The content hash of each file is
+    itself remembered by size and modification time, so a large file is only hashed once per change.
+    When the entries take more than max_bytes, the least recently used ones are deleted.
+    Changes in code called by the function are not detected: clear() the cache after editing it.
+    """
+
+    def __init__(self, directory='Data/.cache', max_bytes=2 * 2**30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.hashes_path = os.path.join(directory, "hashes.json")
+        self.hashes = {}
+        if os.path.exists(self.hashes_path):
+            with open(self.hashes_path) as file:
+                self.hashes = json.load(file)
+
+    def dataset_hash(self, file_path, block_size=16 * 2**20):
+        """BLAKE2 hash of the file contents."""
+        stat = os.stat(file_path)
+        path = os.path.abspath(file_path)
+        known = self.hashes.get(path)
+        if known is not None and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return known[2]
+
+        digest = hashlib.blake2b(digest_size=20)
+        with open(file_path, "rb") as file:
+            while block := file.read(block_size):
+                digest.update(block)
+        self.hashes[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        self._write(self.hashes_path, json.dumps(self.hashes).encode())
+        return digest.hexdigest()
+
+    def key(self, func, file_path, args, kwargs):
+        code = getattr(func, '__code__', None)
+        description = repr((
+            self.dataset_hash(file_path),
+            f"{func.__module__}.{func.__qualname__}",
+            hashlib.blake2b(_code_description(code).encode()).hexdigest() if code is not None else None,
+            getattr(func, '__defaults__', None),
+            getattr(func, '__kwdefaults__', None),
+            args,
+            sorted(kwargs.items()),
+        ))
+        return hashlib.blake2b(description.encode(), digest_size=20).hexdigest()
+
+    def call(self, func, file_path, *args, **kwargs):
+        """func(file_path, *args, **kwargs), computed only if no result is cached for this dataset and arguments."""
+        path = os.path.join(self.directory, self.key(func, file_path, args, kwargs) + ".pkl")
+        try:
+            with open(path, "rb") as file:
+                result = pickle.load(file)
+            os.utime(path)  # Marks the entry as recently used
+            return result
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+
+        result = func(file_path, *args, **kwargs)
+        self._write(path, pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+        self.evict()
+        return result
+
+    def memoize(self, func):
+        """Decorator form of call()."""
+        @functools.wraps(func)
+        def wrapper(file_path, *args, **kwargs):
+            return self.call(func, file_path, *args, **kwargs)
+        return wrapper
+
+    def _write(self, path, data):
+        # Written under a temporary name first, so an interrupted write never leaves a truncated entry
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+
+    def entries(self):
+        """(last use, size, path) of every cached result, least recently used first."""
+        with os.scandir(self.directory) as scan:
+            entries = [(entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                       for entry in scan if entry.name.endswith(".pkl")]
+        return sorted(entries)
+
+    def evict(self):
+        """Deletes the least recently used results until the cache fits in max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
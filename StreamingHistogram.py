@@ -0,0 +1,137 @@
+import numpy as np
+
+
+class ExponentialAccumulator:
+    """
+    Running histogram of the time between detections.
+
+    Keeps one counter per millisecond, so the plotted histogram can be rebinned
+    for any number of bins or X-axis range without revisiting old pulses.
+    """
+
+    def __init__(self, max_value=2**20):
+        self.max_value = max_value  # Intervals longer than this (ms) are only counted as overflow
+        self.reset()
+
+    def reset(self):
+        """Forget every pulse counted so far."""
+        self.fine_counts = np.zeros(1024, dtype=np.int64)
+        self.overflow = 0
+        self.total = 0
+
+    def add(self, time_differences):
+        """Count a batch of newly arrived time differences (ms)."""
+        values = np.asarray(time_differences, dtype=np.int64)
+        if values.size == 0:
+            return
+
+        in_range = (values >= 0) & (values < self.max_value)
+        self.overflow += int(values.size - np.count_nonzero(in_range))
+        self.total += int(values.size)
+        values = values[in_range]
+        if values.size == 0:
+            return
+
+        # Grow the per-millisecond counters geometrically when a longer interval shows up
+        largest = int(values.max())
+        if largest >= len(self.fine_counts):
+            new_size = min(max(2 * len(self.fine_counts), largest + 1), self.max_value)
+            grown = np.zeros(new_size, dtype=np.int64)
+            grown[:len(self.fine_counts)] = self.fine_counts
+            self.fine_counts = grown
+
+        np.add.at(self.fine_counts, values, 1)
+
+    def histogram(self, num_bins, min_value, max_value):
+        """
+        Returns (frequencies, bin_edges) exactly as np.histogram(values, bins=num_bins, range=(min_value, max_value))
+        would on every value counted so far. The cost depends only on the range, not on the number of pulses.
+        """
+        bin_edges = np.linspace(min_value, max_value, num_bins + 1)
+        low = max(int(np.ceil(min_value)), 0)
+        high = min(int(np.floor(max_value)) + 1, len(self.fine_counts))
+        if high <= low:
+            return np.zeros(num_bins, dtype=np.int64), bin_edges
+
+        values = np.arange(low, high)
+        frequencies, _ = np.histogram(values, bins=bin_edges, weights=self.fine_counts[low:high])
+        return frequencies.astype(np.int64), bin_edges
+
+
+class PoissonAccumulator:
+    """
+    Running distribution of the number of counts per fixed time interval.
+
+    Only the intervals that are still open are kept; once an interval is complete its count
+    is folded into the frequency table, so memory and per-update cost do not grow with the run.
+    """
+
+    def __init__(self, interval_size):
+        self.interval_size = interval_size
+        self.reset()
+
+    def reset(self):
+        """Forget every timestamp counted so far."""
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.completed_intervals = 0  # Intervals already folded into count_frequencies
+        self.open_counts = np.zeros(16, dtype=np.int64)  # Counts of intervals completed_intervals, completed_intervals + 1, ...
+        self.count_frequencies = np.zeros(16, dtype=np.int64)
+
+    def add(self, time_stamps):
+        """Count a batch of newly arrived Arduino time stamps (ms)."""
+        time_stamps = np.asarray(time_stamps, dtype=np.int64)
+        if time_stamps.size == 0:
+            return
+
+        if self.first_timestamp is None:
+            self.first_timestamp = int(time_stamps[0])
+        newest = int(time_stamps.max())
+        self.last_timestamp = newest if self.last_timestamp is None else max(self.last_timestamp, newest)
+
+        # Position of each time stamp relative to the first interval that is still open
+        offsets = (time_stamps - self.first_timestamp) // self.interval_size - self.completed_intervals
+        offsets = offsets[offsets >= 0]  # Late arrivals for already completed intervals are discarded
+        if offsets.size:
+            largest = int(offsets.max())
+            if largest >= len(self.open_counts):
+                self.open_counts = self._grow(self.open_counts, largest + 1)
+            np.add.at(self.open_counts, offsets, 1)
+
+        # Fold every interval that is now complete into the frequency table
+        num_intervals = (self.last_timestamp - self.first_timestamp) // self.interval_size
+        newly_completed = num_intervals - self.completed_intervals
+        if newly_completed > 0:
+            finished = self.open_counts[:newly_completed]
+            largest = int(finished.max())
+            if largest >= len(self.count_frequencies):
+                self.count_frequencies = self._grow(self.count_frequencies, largest + 1)
+            self.count_frequencies[:largest + 1] += np.bincount(finished, minlength=largest + 1)
+
+            remaining = np.zeros_like(self.open_counts)
+            kept = self.open_counts[newly_completed:]
+            remaining[:len(kept)] = kept
+            self.open_counts = remaining
+            self.completed_intervals = num_intervals
+
+    def rebin(self, interval_size, time_stamps):
+        """Start over with a new interval size, recounting the retained time stamps in one vectorized pass."""
+        self.interval_size = interval_size
+        self.reset()
+        self.add(np.fromiter(time_stamps, dtype=np.int64, count=len(time_stamps)))
+
+    def histogram(self):
+        """
+        Returns (frequencies, bin_edges) of the counts per completed interval,
+        with one bin per integer count from 0 up to the maximum observed count.
+        """
+        nonzero = np.flatnonzero(self.count_frequencies)
+        max_count = int(nonzero[-1]) if nonzero.size else 0
+        bin_edges = np.arange(0, max_count + 2)
+        return self.count_frequencies[:max_count + 1].copy(), bin_edges
+
+    @staticmethod
+    def _grow(array, minimum_size):
+        grown = np.zeros(max(2 * len(array), minimum_size), dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
@@ -0,0 +1,39 @@
+import json
+import pytest
+import BatchAnalysis
+from Dataset import synthetic_dataset
+
+
+def test_interrupted_batch_keeps_finished_files(tmp_path, monkeypatch):
+    file_paths = []
+    for seed in range(3):
+        file_path = str(tmp_path / f"GeigerDataset_{seed}.txt")
+        with open(file_path, "w") as file:
+            file.writelines("%d %d %d %d %d\n" % tuple(record) for record in synthetic_dataset(1000, seed=seed).tolist())
+        file_paths.append(file_path)
+    cache_path = str(tmp_path / "batch_results.json")
+
+    analyze_file = BatchAnalysis.analyze_file
+
+    def interrupted(file_path, **options):
+        if file_path == file_paths[2]:
+            raise KeyboardInterrupt
+        return analyze_file(file_path, **options)
+
+    monkeypatch.setattr(BatchAnalysis, 'analyze_file', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        BatchAnalysis.run_batch(file_paths, cache_path, workers=1)
+    with open(cache_path) as file:
+        assert sorted(json.load(file)) == file_paths[:2]
+
+    # Only the file left is analyzed on the next run
+    analyzed = []
+
+    def recorded(file_path, **options):
+        analyzed.append(file_path)
+        return analyze_file(file_path, **options)
+
+    monkeypatch.setattr(BatchAnalysis, 'analyze_file', recorded)
+    rows = BatchAnalysis.run_batch(file_paths, cache_path, workers=1)
+    assert analyzed == file_paths[2:]
+    assert [row['file'] for row in rows] == [f"GeigerDataset_{seed}.txt" for seed in range(3)]
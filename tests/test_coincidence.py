@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+from Coincidence import CoincidenceCounter, difference_histogram
+
+
+def brute_force_histogram(times_a, times_b, max_lag, bin_width):
+    differences = (times_b[None, :] - times_a[:, None]).ravel()
+    edges = np.append(np.arange(-max_lag, max_lag, bin_width), max_lag)
+    return np.histogram(differences[(differences >= -max_lag) & (differences < max_lag)], bins=edges)[0]
+
+
+@pytest.mark.parametrize('max_lag, bin_width', [(10, 1), (10, 4), (10, 3), (7, 5), (5, 20)])
+def test_difference_histogram_matches_brute_force(max_lag, bin_width):
+    rng = np.random.default_rng(0)
+    # Dense pulses, so every difference in [-max_lag, max_lag], +max_lag included, occurs many times
+    times_a = np.sort(rng.integers(0, 2000, 400))
+    times_b = np.sort(rng.integers(0, 2000, 400))
+    expected = brute_force_histogram(times_a, times_b, max_lag, bin_width)
+
+    np.testing.assert_array_equal(difference_histogram(times_a, times_b, max_lag, bin_width, chunk_size=64), expected)
+
+    counter = CoincidenceCounter(2, window=1, max_lag=max_lag, bin_width=bin_width)
+    for start in range(0, len(times_a), 50):
+        counter.add(0, times_a[start:start + 50])
+        counter.add(1, times_b[start:start + 50])
+    counter.finish()
+    np.testing.assert_array_equal(counter.histograms[(0, 1)], expected)
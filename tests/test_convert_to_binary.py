@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from ConvertToBinary import StreamingExtractor, extract_bits, intervals_binary, pair_parity_binary, parity_binary
+
+
+# The original loops, kept as the reference the vectorized extractors must match bit for bit
+def parity_loop(values):
+    return [(1 if value % 2 != 0 else 0) for value in values]
+
+
+def pair_parity_loop(values):
+    numbers = []
+    for i in range(0, len(values) - 1, 2):
+        if values[i] % 2 != 0 and values[i + 1] % 2 == 0:
+            numbers.append(1)
+        elif values[i] % 2 == 0 and values[i + 1] % 2 != 0:
+            numbers.append(0)
+    return numbers
+
+
+def intervals_loop(intervals, Steps=1):
+    numbers = []
+    for i in range(0, len(intervals) - 1, Steps):
+        if intervals[i] > intervals[i + 1]:
+            numbers.append(1)
+        elif intervals[i] < intervals[i + 1]:
+            numbers.append(0)
+    return numbers
+
+
+def random_intervals(seed, size=5001):
+    # Few distinct values, so ties and equal parities are frequent
+    return (14 + np.random.default_rng(seed).exponential(20, size)).astype(np.int64).tolist()
+
+
+def random_chunks(values, seed):
+    rng = np.random.default_rng(seed)
+    cuts = np.sort(rng.integers(0, len(values) + 1, 40))
+    return [values[a:b] for a, b in zip(np.concatenate(([0], cuts)), np.concatenate((cuts, [len(values)])))]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_vectorized_matches_loops(seed):
+    values = random_intervals(seed)
+    assert parity_binary(values).tolist() == parity_loop(values)
+    assert pair_parity_binary(values).tolist() == pair_parity_loop(values)
+    for Steps in (1, 2, 3):
+        assert intervals_binary(values, Steps).tolist() == intervals_loop(values, Steps)
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('method, Steps, reference', [
+    ('parity', 1, parity_loop),
+    ('pair_parity', 1, pair_parity_loop),
+    ('intervals', 1, intervals_loop),
+    ('intervals', 2, lambda values: intervals_loop(values, 2)),
+    ('intervals', 3, lambda values: intervals_loop(values, 3)),
+])
+def test_streaming_matches_loops(seed, method, Steps, reference):
+    values = random_intervals(seed)
+    extractor = StreamingExtractor(method, Steps)
+    bits = np.concatenate([extractor.extract(chunk) for chunk in random_chunks(values, seed)])
+    assert bits.tolist() == reference(values)
+    assert extract_bits(values, method, Steps).tolist() == reference(values)
@@ -0,0 +1,31 @@
+import numpy as np
+from CountStore import LEVELS, CountStore, build_store
+from Dataset import synthetic_dataset
+
+
+def write_dataset(file_path, records):
+    with open(file_path, "w") as file:
+        file.write("".join("%d %d %d %d %d\n" % tuple(record) for record in records.tolist()))
+
+
+def test_build_store_twice_gives_the_same_counts(tmp_path):
+    records = synthetic_dataset(5000, seed=1)
+    file_path = str(tmp_path / "GeigerDataset_test.txt")
+    write_dataset(file_path, records)
+    directory = str(tmp_path / "CountStore")
+
+    first = build_store([file_path], directory)
+    start, end = first.origin_ms, first.last_ms + 1
+    counts = [first.query(start, end, resolution)[1] for resolution in LEVELS]
+    assert counts[0].sum() == len(records)
+
+    # A store already holding other counts (e.g. from the GUI) is replaced, not added to
+    live = CountStore(directory)
+    live.add(records['unix_time'][:100] * 1000)
+    live.close()
+
+    second = build_store([file_path], directory)
+    assert (second.origin_ms, second.last_ms + 1) == (start, end)
+    for resolution, expected in zip(LEVELS, counts):
+        np.testing.assert_array_equal(second.query(start, end, resolution)[1], expected)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["CountStore", "GeigerDataset_test.txt"]
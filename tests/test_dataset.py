@@ -0,0 +1,28 @@
+import numpy as np
+from Dataset import INDEX_STEP, DatasetIndexWriter, index_path, load_time_range, read_index, synthetic_dataset
+
+
+def test_index_entries_inside_a_large_batch(tmp_path):
+    records = synthetic_dataset(50000, rate=200, seed=2)
+    file_path = str(tmp_path / "GeigerDataset_test.txt")
+    text = "".join("%d %d %d %d %d\n" % tuple(record) for record in records.tolist())
+
+    # All the pulses in a single batch, as at a high rate
+    writer = DatasetIndexWriter(index_path(file_path))
+    writer.add(records, text)
+    writer.close()
+    with open(file_path, "w") as file:
+        file.write(text)
+
+    index = read_index(file_path)
+    assert len(index) >= len(records) // INDEX_STEP
+    assert np.diff(index['offset']).max() <= INDEX_STEP * max(len(line) + 1 for line in text.splitlines())
+    with open(file_path, "rb") as file:
+        data = file.read()
+    for offset, unix_time in zip(index['offset'].tolist(), index['unix_time'].tolist()):
+        assert offset == 0 or data[offset - 1:offset] == b"\n"
+        assert int(data[offset:data.index(b"\n", offset)].split()[1]) == unix_time
+
+    start, end = int(records['unix_time'][10000]), int(records['unix_time'][20000])
+    selected = records[(records['unix_time'] >= start) & (records['unix_time'] < end)]
+    np.testing.assert_array_equal(load_time_range(file_path, start, end), selected)
@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+from Dataset import synthetic_dataset
+from Exponential import fit_shifted_exponential
+
+
+@pytest.mark.parametrize('rate', [3.0, 30.0, 100.0])
+def test_rate_confidence_interval_coverage(rate):
+    # Intervals floored to whole ms after a 14 ms dead time, as recorded by the Arduino
+    estimates = []
+    covered = 0
+    for seed in range(40):
+        fit = fit_shifted_exponential(synthetic_dataset(100000, rate=rate, seed=seed)['time_since_last'], dead_time=14)
+        low, high = fit['rate_ci']
+        covered += low <= rate <= high
+        estimates.append(fit['rate'])
+    # 95% intervals: 38 of 40 expected, fewer than 34 happens with probability below 1%
+    assert covered >= 34
+    # No bias beyond the spread of the mean of 40 estimates
+    assert abs(np.mean(estimates) - rate) < 3 * np.std(estimates) / np.sqrt(len(estimates))
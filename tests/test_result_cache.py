@@ -0,0 +1,25 @@
+from ResultCache import ResultCache
+
+
+def define(source):
+    namespace = {'__name__': 'analysis_under_edit'}
+    exec(source, namespace)
+    return namespace['count_kept']
+
+
+def test_editing_a_constant_invalidates_the_result(tmp_path):
+    file_path = tmp_path / "GeigerDataset_test.txt"
+    file_path.write_text("".join(f"{i} 1716500000 750 {i * 20} {i % 30}\n" for i in range(100)))
+    cache = ResultCache(str(tmp_path / "cache"))
+
+    source = '''
+def count_kept(file_path, column=4):
+    with open(file_path) as file:
+        return sum(1 for line in file if int(line.split()[column]) >= 14)
+'''
+    first = cache.call(define(source), str(file_path))
+    assert cache.call(define(source), str(file_path)) == first
+    # 14 is a constant of the nested generator expression, not of count_kept itself
+    assert cache.call(define(source.replace('>= 14', '>= 18')), str(file_path)) != first
+    assert cache.call(define(source.replace('column=4', 'column=0')), str(file_path)) != first
+    assert len(cache.entries()) == 3